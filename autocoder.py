@@ -6,14 +6,49 @@ autocoder.py
 auto auto auto
 """
 
+import argparse
+import concurrent.futures
+import functools
+import importlib
+import multiprocessing
+import os
 import re
+import string
+import sys
+import zlib
 
+import instrument
+import tree
+from instrument import count, phase
+
+# {$interactions} blocks with fewer interactions than this render serially
+PARALLEL_THRESHOLD = 1000
+PARALLEL_CHUNKSIZE = 250
+
+block_re = re.compile(r'{\$(\w+)}')
 name_re = re.compile(r'{(?P<path>(?P<pathname>(?P<root>\w+)(\.\w+)*)\.(?P<basename>\w+))}')
 
+def plural(name):
+    if name.endswith('s'):
+        return name + 'es'
+    return name + 's'
+
+
+def singular(name):
+    '''the inverse of plural: the 'es' it adds after ss is dropped, and
+    otherwise the s, so classes is class but phases is phase. names ending
+    in a single s, like bus, do not come back'''
+    if name.endswith('sses'):
+        return name[:-2]
+    if name.endswith('s'):
+        return name[:-1]
+    return name
+
+
 def find_list_property(ns, name, *, level_n=0):
     '''recursively find a property called '{name}s' in the dict of objects ns'''
 
-    list_name = name + 's'
+    list_name = plural(name)
     root_object_name = None
 
     for key, obj in ns.items():
@@ -29,7 +64,12 @@ def find_list_property(ns, name, *, level_n=0):
 
         # TODO: if initial search is unsuccessful, try doing it recursively
         for key, obj in ns.items():
-            new_ns = {p: getattr(obj, p)[0] for p in dir(obj) if p.endswith('s')}
+            new_ns = {}
+            for p in dir(obj):
+                if p.endswith('s') and not p.startswith('_'):
+                    elems = getattr(obj, p)
+                    if isinstance(elems, list) and elems:
+                        new_ns[p] = elems[0]
             new_list_name = find_list_property(new_ns, name, level_n=level_n+1)
             if new_list_name:
                 if not root_object_name:
@@ -62,17 +102,153 @@ def attribute_walker(root, path):
             yield from attribute_walker(elem, path[1:])
 
 
-def walk(federate, seq, *, tree_cache=None, interaction=None):
-    '''this function may be the biggest hack I have ever written'''
+def namespace(model):
+    '''the top level format namespace of model, and its TreeDict if it is a tree
+
+    the dicts and lists of a tree are read through its shared tree.Node
+    proxies'''
+    if isinstance(model, tree.Tree):
+        treedict = model.__tree__
+        return {key[-1]: treedict.node(key) for key in treedict.children(())}, treedict
+    return {'federate' : model}, None
+
+
+def tree_namespaces(model, format_ns, name, tree_cache):
+    '''the format namespace for each element of the tree list called name
+
+    the list is found by a query on the schema, and must be the only list
+    of that name. its elements are bound under name, and every list element
+    on the way to it under its singular name'''
+    try:
+        expanded, names = tree_cache[name]
+    except KeyError:
+        matched = model.query(f'**.{plural(name)}[*]').paths
+        if not matched:
+            raise LookupError(f'name {name} not found in tree')
+        if len(matched) > 1:
+            raise LookupError(f'name {name} is ambiguous: ' + ', '.join(
+                '.'.join(p for p in path if p is not Ellipsis) for path in matched))
+        expanded, = matched
+        names = {expanded[i-1]: singular(expanded[i-1])
+                 for i, p in enumerate(expanded) if p is Ellipsis and i}
+        names[expanded[-2]] = name
+        tree_cache[name] = expanded, names
+
+    for context in model.branches(expanded, elements=True, keys=True):
+        ns = dict(format_ns)
+        for k, key in context.items():
+            ns[names.get(k, k)] = model.node(key)
+        yield ns
+
+
+def walk_interactions(federate, interactions, loop_lines, name='interaction'):
+    '''render the body of an {$interactions} block for each interaction
+
+    other blocks over lists of the federate are rendered the same way, with
+    each element bound to name instead'''
     result = []
+    for interaction in interactions:
+        ns = {'federate': federate, name: interaction}
+        m = 0
+        while m < len(loop_lines):
+            l = loop_lines[m]
+            if '{$parameters}' in l:
+                m += 1
+                param_lines = []
+                for k in loop_lines[m:]:
+                    m += 1
+                    if '{parameters$}' in k:
+                        break
+                    param_lines.append(k)
+                for parameter in interaction.parameters:
+                    for k in param_lines:
+                        if '{' in k and '}' in k:
+                            try:
+                                result.append(k.format(parameter=parameter, **ns))
+                            except ValueError as e:
+                                raise ValueError(f'Error parsing lines:\n"\n{"".join(param_lines)}"\n{k}"\n{e}')
+                        else:
+                            result.append(k)
+            elif '{' in l and '}' in l:
+                m += 1
+                result.append(l.format(**ns))
+            else:
+                m += 1
+                result.append(l)
+
+    return result
+
+
+# the federate of the Pool this worker process belongs to
+_pool_federate = None
+
 
-    format_ns = {'federate' : federate}
+def _start_worker(federate):
+    global _pool_federate
+    _pool_federate = federate
+
+
+def _render_range(loop_lines, start, stop):
+    return walk_interactions(_pool_federate,
+                             _pool_federate.interactions[start:stop], loop_lines)
+
+
+class Pool:
+    '''worker processes rendering the {$interactions} blocks of one federate
+
+    the federate is sent to each worker once, as it starts: inherited where
+    processes are forked, and pickled otherwise. a block is then rendered by
+    sending the workers only its lines and ranges of interaction indexes.
+    walk() renders other federates, e.g. shards, serially'''
+
+    def __init__(self, federate, workers=None):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        self.federate = federate
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=context,
+            initializer=_start_worker, initargs=(federate,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def render(self, loop_lines, ranges):
+        '''the rendered lines of each (start, stop) range of interactions'''
+        starts, stops = zip(*ranges)
+        return self.executor.map(functools.partial(_render_range, loop_lines),
+                                 starts, stops)
+
+
+def walk(federate, seq, *, tree_cache=None, interaction=None,
+         executor=None, threshold=PARALLEL_THRESHOLD,
+         chunksize=PARALLEL_CHUNKSIZE):
+    '''this function may be the biggest hack I have ever written
+
+    if an executor is given, {$interactions} blocks with at least threshold
+    interactions are rendered in chunks of chunksize on it and joined back
+    together in order. a Pool of processes started for the federate is
+    what makes this faster: other executors from concurrent.futures work,
+    but threads hold the GIL and other process pools pickle the whole
+    federate with every chunk'''
+    result = []
+
+    format_ns, model = namespace(federate)
+    federate = format_ns.get('federate')
     if interaction:
         format_ns['interaction'] = interaction
 
     if not tree_cache:
         tree_cache = {}
 
+    pending = []
     n = 0
     while n < len(seq):
         line = seq[n]
@@ -100,36 +276,43 @@ def walk(federate, seq, *, tree_cache=None, interaction=None):
                 if '{interactions$}' in l:
                     break
                 loop_lines.append(l)
-            for interaction in federate.interactions:
-                m = 0
-                while m < len(loop_lines):
-                    l = loop_lines[m]
-                    if '{$parameters}' in l:
-                        m += 1
-                        param_lines = []
-                        for k in loop_lines[m:]:
-                            m += 1
-                            if '{parameters$}' in k:
-                                break
-                            param_lines.append(k)
-                        for parameter in interaction.parameters:
-                            for k in param_lines:
-                                if '{' in k and '}' in k:
-                                    try:
-                                        result.append(k.format(federate=federate,
-                                                      interaction=interaction,
-                                                      parameter=parameter))
-                                    except ValueError as e:
-                                        raise ValueError(f'Error parsing lines:\n"\n{"".join(param_lines)}"\n{k}"\n{e}')
-                                else:
-                                    result.append(k)
-                    elif '{' in l and '}' in l:
-                        m += 1
-                        result.append(l.format(federate=federate,
-                                      interaction=interaction))
-                    else:
-                        m += 1
-                        result.append(l)
+            interactions = federate.interactions
+            if isinstance(executor, Pool) and executor.federate is not federate:
+                # its workers hold a different federate
+                executor = None
+            if executor is not None and len(interactions) >= threshold:
+                ranges = [(i, min(i + chunksize, len(interactions)))
+                          for i in range(0, len(interactions), chunksize)]
+                if isinstance(executor, Pool):
+                    chunks = executor.render(loop_lines, ranges)
+                else:
+                    render = functools.partial(walk_interactions, federate,
+                                               loop_lines=loop_lines)
+                    chunks = executor.map(render, (interactions[i:j]
+                                                   for i, j in ranges))
+                # collected at the end, so the rest of the template is
+                # rendered while the chunks are
+                pending.append((len(result), chunks))
+            else:
+                with phase('template.format'):
+                    result.extend(
+                        walk_interactions(federate, interactions, loop_lines))
+        elif block_re.search(line) and '{$parameters}' not in line:
+            # any other list or dict of the federate, e.g. {$signatures}
+            name = block_re.search(line)[1]
+            n += 1
+            loop_lines = []
+            for l in seq[n:]:
+                n += 1
+                if f'{{{name}$}}' in l:
+                    break
+                loop_lines.append(l)
+            elements = getattr(federate, name)
+            if isinstance(elements, dict):
+                elements = elements.values()
+            with phase('template.format'):
+                result.extend(walk_interactions(federate, elements, loop_lines,
+                                                name=singular(name)))
         elif '{$parameters}' in line:
             n += 1
             param_lines = []
@@ -138,32 +321,46 @@ def walk(federate, seq, *, tree_cache=None, interaction=None):
                 if '{parameters$}' in l:
                     break
                 param_lines.append(l)
-            for parameter in interaction:
-                for l in param_lines:
-                    result.append(l.format(federate=federate,
-                                  interaction=interaction,
-                                  parameter=parameter))
+            # outside {$interactions} every distinct parameter is
+            # visited once, e.g. to fill the parameter dispatch table
+            parameters = interaction.parameters if interaction else federate.unique_parameters
+            with phase('template.format'):
+                for parameter in parameters:
+                    for l in param_lines:
+                        result.append(l.format(federate=federate,
+                                      interaction=interaction,
+                                      parameter=parameter))
         elif match and match['root'].isidentifier():
             name = match['root']
+            if model is not None and name not in format_ns:
+                # implicit descent into the tree
+                with phase('template.format'):
+                    for ns in tree_namespaces(model, format_ns, name, tree_cache):
+                        result.append(line.format(**ns))
+                n += 1
+                continue
             path = None
             if name in format_ns:
                 path = [name]
             elif name in tree_cache:
+                count('template.cache_hits')
                 path = tree_cache[name]
             else:
                 # implicit descent into objects
-                path = find_list_property(format_ns, name).split('.')
+                with phase('template.find_list_property'):
+                    path = find_list_property(format_ns, name).split('.')
                 tree_cache[name] = path
             if path:
                 root = format_ns[path[0]]
                 path = path[1:]
-                if path:
-                    for elem in attribute_walker(root, path):
-                        format_ns[name] = elem
+                with phase('template.format'):
+                    if path:
+                        for elem in attribute_walker(root, path):
+                            format_ns[name] = elem
+                            result.append(line.format(**format_ns))
+                        del format_ns[name]
+                    else:
                         result.append(line.format(**format_ns))
-                    del format_ns[name]
-                else:
-                    result.append(line.format(**format_ns))
                 n += 1
             else:
                 raise LookupError(f'name {name} in {match[0]} not found')
@@ -208,28 +405,300 @@ def walk(federate, seq, *, tree_cache=None, interaction=None):
             result.append(line)
             n += 1
 
+    if pending:
+        with phase('template.format'):
+            rendered, start = [], 0
+            for position, chunks in pending:
+                rendered.extend(result[start:position])
+                for chunk in chunks:
+                    rendered.extend(chunk)
+                start = position
+            rendered.extend(result[start:])
+            result = rendered
+
+    count('template.lines', len(result))
     return result
 
 
-def parse(federate, template):
-    return ''.join(walk(federate, template.splitlines(keepends=True)))
+class TemplateError(ValueError):
+    '''every problem found in a template, each with its line number'''
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            '\n'.join(f'line {n}: {message}' for n, message in errors))
+
+
+def check_fields(line, ns, lineno, errors):
+    '''check the replacement fields of line against sample objects in ns
+
+    a sample of None means there is nothing to check attributes against'''
+    try:
+        fields = [f for _, f, _, _ in string.Formatter().parse(line)
+                  if f is not None]
+    except ValueError as e:
+        errors.append((lineno, str(e)))
+        return
+
+    for field in fields:
+        root, *attrs = field.split('[')[0].split('.')
+        if not root:
+            errors.append((lineno, f'positional field {{{field}}} is not supported'))
+            continue
+        if root not in ns:
+            errors.append((lineno, f'name {root} in {{{field}}} is not available here'))
+            continue
+        obj = ns[root]
+        for attr in attrs:
+            if obj is None:
+                break
+            try:
+                obj = getattr(obj, attr)
+            except AttributeError:
+                errors.append((lineno, f'{{{field}}}: {type(obj).__name__} has no attribute {attr}'))
+                break
+
+
+def block_sample(federate, name):
+    '''the first element of the federate's list or dict name, or None'''
+    elements = getattr(federate, name, None) or []
+    if isinstance(elements, dict):
+        elements = elements.values()
+    return next(iter(elements), None)
+
+
+def validate(federate, seq, *, interaction=None):
+    '''check every placeholder in seq against the model without rendering
+
+    raises TemplateError listing all problems found'''
+    errors = []
+
+    format_ns, model = namespace(federate)
+    federate = format_ns.get('federate')
+    if interaction:
+        format_ns['interaction'] = interaction
+
+    tree_cache = {}
+    blocks = []
+    for lineno, line in enumerate(seq, 1):
+        start = block_re.search(line)
+        if start and start[1] == 'parameters':
+            if blocks and blocks[-1][0] == 'parameters':
+                errors.append((lineno, '{$parameters} cannot be nested in {$parameters}'))
+            elif blocks:
+                sample = block_sample(federate, blocks[0][0])
+                if sample is not None and not hasattr(sample, 'parameters'):
+                    errors.append((lineno, f'{{$parameters}}: {singular(blocks[0][0])} '
+                                           'has no list parameters'))
+            blocks.append(('parameters', lineno))
+            continue
+        if start:
+            name = start[1]
+            if blocks:
+                errors.append((lineno, f'{start[0]} cannot be nested in {{${blocks[-1][0]}}}'))
+            elif federate is None:
+                errors.append((lineno, f'{start[0]}: the model has no federate'))
+            elif not hasattr(federate, name):
+                errors.append((lineno, f'{start[0]}: federate has no list {name}'))
+            blocks.append((name, lineno))
+            continue
+        end = re.search(r'{(\w+)\$}', line)
+        if end:
+            if blocks and blocks[-1][0] == end[1]:
+                blocks.pop()
+            else:
+                errors.append((lineno, f'{end[0]} has no matching {{${end[1]}}}'))
+            continue
+
+        scope = [name for name, _ in blocks]
+        if scope and scope[0] != 'parameters':
+            if '{' in line and '}' in line:
+                sample = block_sample(federate, scope[0])
+                ns = {'federate': federate, singular(scope[0]): sample}
+                if 'parameters' in scope:
+                    ns['parameter'] = next(iter(getattr(sample, 'parameters', [])), None)
+                check_fields(line, ns, lineno, errors)
+        elif 'parameters' in scope:
+            parameters = interaction.parameters if interaction else getattr(federate, 'unique_parameters', None)
+            if parameters is None:
+                errors.append((lineno, '{$parameters} outside {$interactions} needs an interaction'))
+                continue
+            ns = dict(format_ns, parameter=next(iter(parameters), None))
+            check_fields(line, ns, lineno, errors)
+        else:
+            match = name_re.search(line)
+            if not (match and match['root'].isidentifier()):
+                continue
+            name = match['root']
+            ns = dict(format_ns)
+            if name not in format_ns and model is not None:
+                try:
+                    ns = next(tree_namespaces(model, format_ns, name, tree_cache),
+                              dict(format_ns, **{name: None}))
+                except LookupError as e:
+                    errors.append((lineno, f'{match[0]}: {e.args[0]}'))
+                    continue
+            elif name not in format_ns:
+                if name not in tree_cache:
+                    try:
+                        with phase('template.find_list_property'):
+                            tree_cache[name] = find_list_property(format_ns, name)
+                    except KeyError as e:
+                        tree_cache[name] = e
+                path = tree_cache[name]
+                if isinstance(path, KeyError):
+                    errors.append((lineno, path.args[0]))
+                    continue
+                if not path:
+                    errors.append((lineno, f'name {name} in {match[0]} not found'))
+                    continue
+                root, *path = path.split('.')
+                ns[name] = next(attribute_walker(format_ns[root], path), None)
+            check_fields(line, ns, lineno, errors)
+
+    for name, lineno in blocks:
+        errors.append((lineno, f'{{${name}}} is never closed'))
+
+    if errors:
+        raise TemplateError(errors)
 
 
-def run(federate, template, out):
-    result = parse(federate, template)
-    f = open(out, 'w', newline='\n')
-    f.write(result)
-    f.close()
+def parse(federate, template, *, check=True, **kwargs):
+    seq = template.splitlines(keepends=True)
+    if check:
+        with phase('template.validate'):
+            validate(federate, seq, interaction=kwargs.get('interaction'))
+    with phase('template.walk'):
+        return ''.join(walk(federate, seq, **kwargs))
 
 
-if __name__ == '__main__':
+class Shard:
+    '''the federate as seen by one shard, with only its own interactions'''
+
+    __slots__ = ('_federate', 'shard', 'shards', 'interactions')
+
+    def __init__(self, federate, shard, shards, interactions):
+        self._federate = federate
+        self.shard = shard
+        self.shards = shards
+        self.interactions = interactions
 
-    import federate_cpp
-    import federate_h
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._federate, name)
 
-    federate = Federate(
-            "Locomotion", FOM("Common.xml", "Locomotion.xml"),
-            Interaction("SetVehicleMotion", "speed", "angle"))
+    def __dir__(self):
+        return sorted(set(dir(self._federate)) | set(self.__slots__))
 
-    run(federate, federate_cpp.template, "Locomotion.cpp")
-    run(federate, federate_h.template, "Locomotion.h")
+
+def shard_of(interaction, shards):
+    '''the shard of interaction, which depends only on its name so adding
+    or removing other interactions never moves it'''
+    name = getattr(interaction, 'fullname', None) or interaction.name
+    return zlib.crc32(name.encode()) % shards
+
+
+def write(out, result):
+    '''write result to out, leaving out untouched if it is unchanged so
+    build tools do not recompile it'''
+    with phase('file.write'):
+        try:
+            with open(out, newline='\n') as f:
+                if f.read() == result:
+                    count('file.unchanged')
+                    return
+        except FileNotFoundError:
+            pass
+        with open(out, 'w', newline='\n') as f:
+            f.write(result)
+
+
+def run(federate, template, out, *, shards=None, header=None,
+        header_out=None, **kwargs):
+    '''render template to out
+
+    with shards, the template is rendered once per shard to out_0, out_1 ...
+    with the federate's interactions split between them, and the files
+    that come out the same are not rewritten. a header template is rendered
+    once for the whole federate, to header_out or out with the extension .h.
+    returns the names of the files'''
+    if not shards:
+        write(out, parse(federate, template, **kwargs))
+        return [out]
+
+    stem, ext = os.path.splitext(out)
+    outs = []
+    if header is not None:
+        header_out = header_out or stem + '.h'
+        write(header_out, parse(federate, header, **kwargs))
+        outs.append(header_out)
+
+    assigned = [[] for _ in range(shards)]
+    for interaction in federate.interactions:
+        assigned[shard_of(interaction, shards)].append(interaction)
+    for n, interactions in enumerate(assigned):
+        shard_out = f'{stem}_{n}{ext}'
+        write(shard_out, parse(Shard(federate, n, shards, interactions),
+                               template, **kwargs))
+        outs.append(shard_out)
+    return outs
+
+
+def profile(federate, template, out, *, report='text', file=None, **kwargs):
+    '''run(), then print where the time went as a text table or as json
+
+    the report goes to file, standard output by default. returns the
+    instrument.Profile'''
+    with instrument.Profile() as p:
+        run(federate, template, out, **kwargs)
+    p.write(report, file)
+    return p
+
+
+def load_template(name):
+    '''the text of the template file name, or the template of the module
+    name, such as federate_py'''
+    if os.path.exists(name):
+        with open(name) as f:
+            return f.read()
+    return importlib.import_module(name).template
+
+
+def main(argv=None):
+    from fom import Federate, FOM, Interaction
+
+    parser = argparse.ArgumentParser(
+        description='generate code for a federate from a template',
+        epilog='e.g. autocoder.py federate_py Locomotion.py --fom Common.xml '
+               'Locomotion.xml --interaction SetVehicleMotion speed angle')
+    parser.add_argument('template',
+                        help='template file, or module with a template, e.g. federate_py')
+    parser.add_argument('out', help='file to write')
+    parser.add_argument('--fom', nargs='+', required=True, metavar='XML',
+                        help='FOM module files')
+    parser.add_argument('--interaction', nargs='+', action='append', default=[],
+                        metavar=('NAME', 'PARAMETER'),
+                        help='an interaction and its parameters, once for each')
+    parser.add_argument('--classname',
+                        help='the federate class name (default: the name of out)')
+    parser.add_argument('--shards', type=int,
+                        help='split the interactions between this many files')
+    parser.add_argument('--profile', nargs='?', const='text',
+                        choices=('text', 'json'),
+                        help='print where the time goes, as text or json')
+    args = parser.parse_args(argv)
+
+    template = load_template(args.template)
+    classname = args.classname or os.path.splitext(os.path.basename(args.out))[0]
+    with instrument.Profile() as p:
+        federate = Federate(classname, FOM(*args.fom),
+                            *(Interaction(*i) for i in args.interaction))
+        run(federate, template, args.out, shards=args.shards)
+    if args.profile:
+        p.write(args.profile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
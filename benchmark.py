@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+"""
+benchmark.py
+
+time each phase of generating code for synthetic FOMs, and compare the
+results against a stored baseline
+
+    python benchmark.py small medium --repeat 5
+    python benchmark.py --save
+    python benchmark.py medium --profile json
+    python benchmark.py large --workers 4
+    python benchmark.py medium --decode 100000
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import autocoder
+import codec
+import federate_py
+import fomgen
+import instrument
+from fom import Federate, FOM, XmlFom
+
+SIZES = {
+    'small': fomgen.FomSpec(interactions=100, parameters=5, datatypes=10),
+    'medium': fomgen.FomSpec(modules=4, depth=3, interactions=1000,
+                             parameters=10, datatypes=50),
+    'large': fomgen.FomSpec(modules=8, depth=4, interactions=5000,
+                            parameters=10, datatypes=100),
+}
+
+PHASES = ('generate', 'parse', 'resolve', 'walk', 'run')
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'benchmark_baseline.json')
+
+# a regression is a phase this much slower, or bigger, than the baseline
+THRESHOLD = 0.25
+
+TEMPLATE = \
+'''
+//* {federate.classname}.cpp *//
+
+class {federate.classname} : public NullFederate
+{
+private:
+  {interaction.handle_define};
+  {parameter.handle_define};
+  {parameter.decoder_define};
+public:
+  {$interactions}
+  virtual void {interaction.callbackname}({interaction.callback_arguments_define});
+  {interactions$}
+};
+
+void {federate.classname}::setUpAfterConnect()
+{
+  {$interactions}
+  {interaction.handlename} = rtiAmbassador->getInteractionClassHandle({interaction.literalname});
+  {$parameters}
+  {parameter.handlename} = rtiAmbassador->getParameterHandle({interaction.handlename}, {parameter.literalname});
+  {parameters$}
+  {interactions$}
+}
+
+void {federate.classname}::receiveInteraction(InteractionClassHandle theInteraction,
+                                              const ParameterHandleValueMap& theParameterValues)
+{
+  {$interactions}
+  if (theInteraction == {interaction.handlename})
+  {
+    {$parameters}
+    {parameter.decodername}.decode(theParameterValues.at({parameter.handlename}));
+    {parameters$}
+    {interaction.callbackname}({interaction.callback_arguments});
+    return;
+  }
+  {interactions$}
+}
+'''
+
+
+def pipeline(spec, directory, phase):
+    '''generate code for spec, with each phase run inside phase(name)'''
+    with phase('generate'):
+        filenames = fomgen.write(spec, directory)
+    with phase('parse'):
+        xml = XmlFom(FOM(*filenames))
+    with phase('resolve'):
+        federate = Federate('Benchmark', xml, *fomgen.interactions(spec))
+    seq = TEMPLATE.splitlines(keepends=True)
+    with phase('walk'):
+        autocoder.walk(federate, seq)
+    with phase('run'):
+        autocoder.run(federate, TEMPLATE, os.path.join(directory, 'Benchmark.cpp'))
+
+
+def timer(results):
+    @contextlib.contextmanager
+    def phase(name):
+        start = time.perf_counter()
+        yield
+        results[name] = time.perf_counter() - start
+    return phase
+
+
+def tracer(results):
+    '''record the peak memory allocated during each phase, above what was
+    already allocated when it started'''
+    @contextlib.contextmanager
+    def phase(name):
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        yield
+        _, peak = tracemalloc.get_traced_memory()
+        results[name] = peak - start
+    return phase
+
+
+def measure(spec, repeat=3):
+    '''the best time and the peak memory of each phase for spec
+
+    memory is traced in a separate run, as tracing slows everything down'''
+    times = {}
+    for _ in range(repeat):
+        run = {}
+        with tempfile.TemporaryDirectory() as directory:
+            pipeline(spec, directory, timer(run))
+        for name, t in run.items():
+            times[name] = min(t, times.get(name, t))
+
+    peaks = {}
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            pipeline(spec, directory, tracer(peaks))
+    finally:
+        tracemalloc.stop()
+
+    return {'spec': spec.asdict(), 'time': times, 'peak': peaks}
+
+
+def profile(spec, *timers):
+    '''an instrument.Profile of one run of the pipeline for spec'''
+    with tempfile.TemporaryDirectory() as directory:
+        with instrument.Profile(*timers) as p:
+            pipeline(spec, directory, instrument.phase)
+    return p
+
+
+def parallel(spec, workers, repeat=3):
+    '''the best time to walk the template for spec serially, and with an
+    autocoder.Pool of workers processes, and the time the pool takes to start
+
+    every {$interactions} block is rendered in parallel, in one chunk per
+    worker. the output must be the same either way'''
+    times = {}
+
+    def best(name, t):
+        times[name] = min(t, times.get(name, t))
+
+    seq = TEMPLATE.splitlines(keepends=True)
+    with tempfile.TemporaryDirectory() as directory:
+        federate = Federate('Benchmark', XmlFom(FOM(*fomgen.write(spec, directory))),
+                            *fomgen.interactions(spec))
+    chunksize = -(-spec.interactions // workers)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        expected = autocoder.walk(federate, seq)
+        best('serial', time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with autocoder.Pool(federate, workers) as pool:
+            # the workers start with the first block rendered
+            autocoder.walk(federate, ['{$interactions}\n', '{interactions$}\n'],
+                           executor=pool, threshold=1, chunksize=chunksize)
+            best('start', time.perf_counter() - start)
+            start = time.perf_counter()
+            result = autocoder.walk(federate, seq, executor=pool, threshold=1,
+                                    chunksize=chunksize)
+            best('parallel', time.perf_counter() - start)
+        if result != expected:
+            raise AssertionError('parallel output differs from serial output')
+    return times
+
+
+def capture(federate, records):
+    '''a capture of records interactions, as federate_py decodes, and the
+    codecs of the interactions in it, by index
+
+    only interactions with fixed-width parameters are captured. half the
+    records are interleaved at random, and half in runs of one interaction'''
+    by_name = codec.codecs(federate)
+    interactions = [i for i in federate.interactions if i.name in by_name]
+    codecs = {i.index: by_name[i.name] for i in interactions}
+    rng = random.Random(0)
+    order = [rng.choice(interactions) for _ in range(records // 2)]
+    order += [i for i in interactions
+              for _ in range((records - len(order)) // len(interactions))]
+    header = struct.Struct('>H')
+    data = b''.join(
+        header.pack(i.index) + codecs[i.index].pack(
+            *(b'c' if p.typecode == 'c' else k % 100 / 4 if p.typecode in 'fd'
+              else k % 100 for p in i.parameters))
+        for k, i in enumerate(order))
+    return data, codecs
+
+
+def unpack(data, codecs):
+    '''the columns of a capture, unpacking one record at a time'''
+    rows = {n: [] for n in codecs}
+    offset = 0
+    while offset < len(data):
+        n, = struct.unpack_from('>H', data, offset)
+        c = codecs[n]
+        rows[n].append(c.unpack_from(data, offset + 2))
+        offset += 2 + c.size
+    return {codecs[n].name: dict(zip(codecs[n].names, map(list, zip(*r))))
+            for n, r in rows.items() if r}
+
+
+def decode(spec, records, repeat=3):
+    '''the best time to decode a capture of records interactions of spec
+    one record at a time, and with the generated federate_py decode(), as
+    arrays and, if numpy is installed, as numpy arrays
+
+    the columns must be the same every way'''
+    with tempfile.TemporaryDirectory() as directory:
+        federate = Federate('Capture', XmlFom(FOM(*fomgen.write(spec, directory))),
+                            *fomgen.interactions(spec))
+    module = {}
+    exec(autocoder.parse(federate, federate_py.template), module)
+    data, codecs = capture(federate, records)
+    ways = {'unpack': lambda: unpack(data, codecs),
+            'array': lambda: module['decode'](data, use_numpy=False)}
+    if module['numpy'] is not None:
+        ways['numpy'] = lambda: module['decode'](data, use_numpy=True)
+
+    times = {}
+    expected = None
+    for name, way in ways.items():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            columns = way()
+            t = time.perf_counter() - start
+            times[name] = min(t, times.get(name, t))
+        columns = {i: {p: list(c) for p, c in cs.items()} for i, cs in columns.items()}
+        if expected is None:
+            expected = columns
+        elif columns != expected:
+            raise AssertionError(f'{name} decode differs from unpacking each record')
+    return times
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    '''the (size, metric, phase, baseline, result) of every regression
+
+    sizes whose spec differs from the baseline's are not compared'''
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None or base['spec'] != result['spec']:
+            continue
+        for metric in ('time', 'peak'):
+            for name, value in result.get(metric, {}).items():
+                before = base.get(metric, {}).get(name)
+                if before and value > before * (1 + threshold):
+                    regressions.append((size, metric, name, before, value))
+    return regressions
+
+
+def report(results, baseline, out=sys.stdout):
+    for size, result in results.items():
+        base = baseline.get(size, {})
+        print(f'{size}: {fomgen.FomSpec(**result["spec"])}', file=out)
+        print(f'  {"phase":10} {"time (ms)":>10} {"baseline":>10} '
+              f'{"peak (KiB)":>11} {"baseline":>10}', file=out)
+        for name in PHASES:
+            t = result['time'][name] * 1000
+            m = result['peak'][name] / 1024
+            bt = base.get('time', {}).get(name)
+            bm = base.get('peak', {}).get(name)
+            bt = f'{bt * 1000:10.1f}' if bt is not None else f'{"-":>10}'
+            bm = f'{bm / 1024:10.0f}' if bm is not None else f'{"-":>10}'
+            print(f'  {name:10} {t:10.1f} {bt} {m:11.0f} {bm}', file=out)
+
+
+def load(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save(filename, baseline):
+    with open(filename, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sizes', nargs='*',
+                        help=f"sizes of FOM to benchmark, of {', '.join(SIZES)} "
+                             "(default: small medium)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs to take the best time of')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='fraction slower or bigger that is a regression')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results in the baseline file')
+    parser.add_argument('--profile', nargs='?', const='text',
+                        choices=('text', 'json'),
+                        help='instead, profile one run of each size and print '
+                             'where the time goes, as text or json')
+    parser.add_argument('--workers', type=int,
+                        help='instead, time walking each size serially and '
+                             'with this many worker processes')
+    parser.add_argument('--decode', type=int, metavar='RECORDS',
+                        help='instead, time decoding a capture of this many '
+                             'interactions of each size, one record at a time '
+                             'and with the generated decoder')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or ['small', 'medium']
+    for size in sizes:
+        if size not in SIZES:
+            parser.error(f'unknown size {size}')
+
+    if args.profile:
+        profiles = {size: profile(SIZES[size]) for size in sizes}
+        if args.profile == 'json':
+            json.dump({size: p.asdict() for size, p in profiles.items()},
+                      sys.stdout, indent=2)
+            print()
+        else:
+            for size, p in profiles.items():
+                print(f'{size}: {SIZES[size]}')
+                p.report()
+        return 0
+
+    if args.workers:
+        print(f'  {"size":10} {"serial (ms)":>12} {"parallel (ms)":>14} '
+              f'{"speedup":>8} {"start (ms)":>11}')
+        slower = []
+        for size in sizes:
+            times = parallel(SIZES[size], args.workers, args.repeat)
+            print(f'  {size:10} {times["serial"] * 1000:12.1f} '
+                  f'{times["parallel"] * 1000:14.1f} '
+                  f'{times["serial"] / times["parallel"]:8.2f} '
+                  f'{times["start"] * 1000:11.1f}')
+            if times['parallel'] >= times['serial']:
+                slower.append((size, 'parallel', 'serial'))
+        for size, name, than in slower:
+            print(f'regression: {size} {name} is no faster than {than}')
+        return 1 if slower else 0
+
+    if args.decode:
+        print(f'  {"size":10} {"unpack (ms)":>12} {"array (ms)":>11} '
+              f'{"numpy (ms)":>11}')
+        slower = []
+        for size in sizes:
+            times = decode(SIZES[size], args.decode, args.repeat)
+            numpy = times.get('numpy')
+            numpy = f'{numpy * 1000:11.1f}' if numpy is not None else f'{"-":>11}'
+            print(f'  {size:10} {times["unpack"] * 1000:12.1f} '
+                  f'{times["array"] * 1000:11.1f} {numpy}')
+            slower += [(size, name, 'unpack') for name in ('array', 'numpy')
+                       if times.get(name, 0) >= times['unpack']]
+        for size, name, than in slower:
+            print(f'regression: {size} {name} is no faster than {than}')
+        return 1 if slower else 0
+
+    results = {size: measure(SIZES[size], args.repeat) for size in sizes}
+    baseline = load(args.baseline)
+    report(results, baseline)
+
+    if args.save:
+        baseline.update(results)
+        save(args.baseline, baseline)
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for size, metric, name, before, value in regressions:
+        print(f'regression: {size} {name} {metric} {before:.4g} -> {value:.4g}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+codec.py
+
+encode and decode interactions as HLA basic data with precompiled structs
+"""
+
+import functools
+import itertools
+import struct
+
+# struct codes for the fixed-width basic representations. the byte order
+# is '>' or '<', or '' for single bytes which have none
+StructCodes = {
+    'HLAASCIIchar': ('', 'c'),
+    'HLAboolean': ('>', 'i'),
+    'HLAbyte': ('', 'b'),
+    'HLAfloat32BE': ('>', 'f'),
+    'HLAfloat32LE': ('<', 'f'),
+    'HLAfloat64BE': ('>', 'd'),
+    'HLAfloat64LE': ('<', 'd'),
+    'HLAinteger16LE': ('<', 'h'),
+    'HLAinteger16BE': ('>', 'h'),
+    'HLAinteger32BE': ('>', 'i'),
+    'HLAinteger32LE': ('<', 'i'),
+    'HLAinteger64BE': ('>', 'q'),
+    'HLAinteger64LE': ('<', 'q'),
+    'HLAoctet': ('', 'B'),
+    'HLAoctetPairBE': ('>', 'H'),
+    'HLAoctetPairLE': ('<', 'H'),
+    'HLAunicodeChar': ('>', 'H'),
+}
+
+# numpy dtype of the values of each struct code, without the byte order
+DtypeCodes = {
+    'c': 'S1',
+    'b': 'i1',
+    'B': 'u1',
+    'h': 'i2',
+    'H': 'u2',
+    'i': 'i4',
+    'q': 'i8',
+    'f': 'f4',
+    'd': 'f8',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compiled(fmt):
+    '''the Struct for fmt, shared by every codec with the same layout'''
+    return struct.Struct(fmt)
+
+
+def size(representation):
+    '''the encoded size in bytes, or None if representation is not a
+    fixed-width basic datatype'''
+    try:
+        order, code = StructCodes[representation]
+    except KeyError:
+        return None
+    return compiled((order or '>') + code).size
+
+
+def typecode(representation):
+    '''the struct code of the decoded values, or None if representation is
+    not a fixed-width basic datatype
+
+    it is also their array module typecode, except for 'c', single bytes'''
+    return StructCodes.get(representation, (None, None))[1]
+
+
+def dtype(representation):
+    '''the numpy dtype of the decoded values, or None if representation is
+    not a fixed-width basic datatype'''
+    try:
+        order, code = StructCodes[representation]
+    except KeyError:
+        return None
+    return (order or '|') + DtypeCodes[code]
+
+
+def runs(representations):
+    '''split representations into runs with one byte order each
+
+    yields (start, stop, format) for each run'''
+    start = 0
+    order, codes = None, []
+    for n, representation in enumerate(representations):
+        try:
+            o, code = StructCodes[representation]
+        except KeyError:
+            raise ValueError(f'{representation} is not a fixed-width basic datatype') from None
+        if o and order and o != order:
+            yield start, n, order + ''.join(codes)
+            start, order, codes = n, None, []
+        order = order or o
+        codes.append(code)
+    yield start, len(codes) + start, (order or '>') + ''.join(codes)
+
+
+class Codec:
+    '''packs and unpacks the parameter values of one interaction
+
+    values are laid out one after another without padding, in the order of
+    the interaction's parameters. each run of parameters with the same byte
+    order is handled by one precompiled Struct'''
+
+    __slots__ = ('name', 'names', 'size', '_runs', '_struct')
+
+    def __init__(self, interaction):
+        self.name = interaction.name
+        self.names = tuple(p.name for p in interaction.parameters)
+        self._runs = []
+        offset = 0
+        for start, stop, fmt in runs(p.representation for p in interaction.parameters):
+            s = compiled(fmt)
+            self._runs.append((offset, start, stop, s))
+            offset += s.size
+        self.size = offset
+        # the common case of a single byte order needs no splitting
+        self._struct = self._runs[0][3] if len(self._runs) == 1 else None
+
+    def __repr__(self):
+        return f"Codec('{self.name}', {', '.join(self.names)})"
+
+    def pack_into(self, buffer, offset, *values):
+        if self._struct is not None:
+            self._struct.pack_into(buffer, offset, *values)
+            return
+        for run_offset, start, stop, s in self._runs:
+            s.pack_into(buffer, offset + run_offset, *values[start:stop])
+
+    def pack(self, *values):
+        if self._struct is not None:
+            return self._struct.pack(*values)
+        buffer = bytearray(self.size)
+        self.pack_into(buffer, 0, *values)
+        return bytes(buffer)
+
+    def unpack_from(self, buffer, offset=0):
+        if self._struct is not None:
+            return self._struct.unpack_from(buffer, offset)
+        values = ()
+        for run_offset, _, _, s in self._runs:
+            values += s.unpack_from(buffer, offset + run_offset)
+        return values
+
+    def unpack(self, buffer):
+        if len(buffer) != self.size:
+            raise struct.error(f'{self.name} needs a buffer of {self.size} bytes')
+        return self.unpack_from(buffer)
+
+    def pack_many(self, records, buffer=None, offset=0):
+        '''pack a sequence of value tuples one after another into buffer
+
+        a bytearray of the right size is allocated if buffer is None.
+        returns the buffer'''
+        if buffer is None:
+            buffer = bytearray(offset + len(records) * self.size)
+        pack_into, size = self.pack_into, self.size
+        if self._struct is not None:
+            pack_into = self._struct.pack_into
+        for values in records:
+            pack_into(buffer, offset, *values)
+            offset += size
+        return buffer
+
+    def unpack_many(self, buffer, count=None, offset=0):
+        '''iterate over the value tuples packed one after another in buffer
+
+        the buffer is read through a memoryview, so nothing is copied'''
+        if not self.size:
+            return itertools.repeat((), count or 0)
+        view = memoryview(buffer)[offset:]
+        if count is None:
+            count = len(view) // self.size
+        view = view[:count * self.size]
+        if self._struct is not None:
+            return self._struct.iter_unpack(view)
+        return (self.unpack_from(view, n * self.size) for n in range(count))
+
+
+def codecs(federate):
+    '''a Codec for each of the federate's interactions, by name
+
+    interactions with variable-length parameters cannot be packed into a
+    fixed layout and are left out'''
+    result = {}
+    for interaction in federate.interactions:
+        try:
+            result[interaction.name] = Codec(interaction)
+        except ValueError:
+            continue
+    return result
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""
+engines.py
+
+run the same templates through every code generation engine on the same
+synthetic FOMs, check that they agree and compare how fast they walk
+
+    python engines.py small --repeat 5
+    python engines.py --template federate.cpp.in --save
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+
+import autocoder
+import benchmark
+import fom
+import fomgen
+import hla_autocoder
+
+# templates using only what every engine handles the same way: explicit
+# blocks and federate lines. implicit interaction and parameter lines are
+# interleaved by hla_autocoder and not by autocoder
+CORPUS = {
+    'declarations':
+'''class {federate.classname} : public NullFederate
+{
+public:
+  {$interactions}
+  virtual void {interaction.callbackname}({interaction.callback_arguments_define});
+  {interactions$}
+};
+''',
+    'setup':
+'''void {federate.classname}::setUpAfterConnect()
+{
+  {$interactions}
+  {interaction.handlename} = rtiAmbassador->getInteractionClassHandle({interaction.literalname});
+  {$parameters}
+  {parameter.handlename} = rtiAmbassador->getParameterHandle({interaction.handlename}, {parameter.literalname});
+  {parameters$}
+  {interactions$}
+}
+''',
+    'receive':
+'''void {federate.classname}::receiveInteraction(InteractionClassHandle theInteraction,
+                                              const ParameterHandleValueMap& theParameterValues)
+{
+  {$interactions}
+  if (theInteraction == {interaction.handlename})
+  {
+    {$parameters}
+    {parameter.decodername}.decode(theParameterValues.at({parameter.handlename}));
+    {parameters$}
+    {interaction.callbackname}({interaction.callback_arguments});
+    return;
+  }
+  {interactions$}
+}
+''',
+}
+
+
+class Engine:
+    '''a walk function and how to build the federate model it walks'''
+
+    __slots__ = ('name', 'walk', 'federate')
+
+    def __init__(self, name, walk, federate):
+        self.name = name
+        self.walk = walk
+        self.federate = federate
+
+    def __repr__(self):
+        return f"Engine('{self.name}')"
+
+
+ENGINES = {}
+
+
+def register(name, walk, federate):
+    '''add an engine to compare
+
+    federate(classname, filenames, spec) must return the model of a federate
+    using every interaction of the FOM spec, which was written to filenames'''
+    ENGINES[name] = Engine(name, walk, federate)
+
+
+def fom_federate(classname, filenames, spec):
+    return fom.Federate(classname, fom.FOM(*filenames), *fomgen.interactions(spec))
+
+
+def hla_federate(classname, filenames, spec):
+    interactions = [hla_autocoder.Interaction(name, *parameters)
+                    for _, name, parameters in fomgen.interaction_names(spec)]
+    return hla_autocoder.Federate(classname, hla_autocoder.FOM(*filenames),
+                                  *interactions)
+
+
+# the first engine is the reference the others must agree with
+register('autocoder', autocoder.walk, fom_federate)
+register('hla_autocoder', hla_autocoder.walk, hla_federate)
+
+
+def render(engine, federate, corpus):
+    '''the lines of output of each template'''
+    return {name: engine.walk(federate, template.splitlines(keepends=True))
+            for name, template in corpus.items()}
+
+
+def mismatches(reference, output):
+    '''the (template, line number) of the first difference in each template
+
+    the line number counts from 1, and is one past the end of the shorter
+    output if one is a prefix of the other'''
+    result = []
+    for name, expected in reference.items():
+        lines = output[name]
+        if lines == expected:
+            continue
+        n = next((n for n, (a, b) in enumerate(zip(expected, lines)) if a != b),
+                 min(len(expected), len(lines)))
+        result.append((name, n + 1))
+    return result
+
+
+def measure(spec, engines, corpus, repeat=3):
+    '''the best time each engine takes to walk the whole corpus for spec,
+    the lines it renders and where its output differs from the first
+    engine's'''
+    times, lines, outputs = {}, {}, {}
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = fomgen.write(spec, directory)
+        for engine in engines:
+            federate = engine.federate('Benchmark', filenames, spec)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = render(engine, federate, corpus)
+                t = time.perf_counter() - start
+                times[engine.name] = min(t, times.get(engine.name, t))
+            outputs[engine.name] = output
+            lines[engine.name] = sum(
+                ''.join(o).count('\n') for o in output.values())
+
+    reference = outputs[engines[0].name]
+    differences = {engine.name: mismatches(reference, outputs[engine.name])
+                   for engine in engines[1:]}
+    return {'spec': spec.asdict(), 'time': times, 'lines': lines,
+            'mismatches': {name: d for name, d in differences.items() if d}}
+
+
+def report(results, baseline, out=sys.stdout):
+    for key, result in results.items():
+        base = baseline.get(key, {}).get('time', {})
+        print(f'{key}: {fomgen.FomSpec(**result["spec"])}', file=out)
+        print(f'  {"engine":14} {"lines":>8} {"time (ms)":>10} '
+              f'{"lines/s":>10} {"baseline":>10}', file=out)
+        for name, t in result['time'].items():
+            lines = result['lines'][name]
+            before = base.get(name)
+            before = f'{lines / before:10.0f}' if before else f'{"-":>10}'
+            print(f'  {name:14} {lines:8} {t * 1000:10.1f} {lines / t:10.0f} '
+                  f'{before}', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sizes', nargs='*',
+                        help=f"sizes of FOM to render, of {', '.join(benchmark.SIZES)} "
+                             "(default: small)")
+    parser.add_argument('--engine', action='append', dest='engines',
+                        help=f"engine to run, of {', '.join(ENGINES)} "
+                             "(default: all)")
+    parser.add_argument('--template', action='append', default=[],
+                        help='template file to add to the corpus')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs to take the best time of')
+    parser.add_argument('--baseline', default=benchmark.BASELINE,
+                        help='baseline file to compare against')
+    parser.add_argument('--threshold', type=float, default=benchmark.THRESHOLD,
+                        help='fraction slower that is a regression')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results in the baseline file')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or ['small']
+    for size in sizes:
+        if size not in benchmark.SIZES:
+            parser.error(f'unknown size {size}')
+    names = args.engines or list(ENGINES)
+    for name in names:
+        if name not in ENGINES:
+            parser.error(f'unknown engine {name}')
+    corpus = dict(CORPUS)
+    for filename in args.template:
+        with open(filename) as f:
+            corpus[filename] = f.read()
+
+    engines = [ENGINES[name] for name in names]
+    results = {f'engines/{size}': measure(benchmark.SIZES[size], engines,
+                                          corpus, args.repeat)
+               for size in sizes}
+    baseline = benchmark.load(args.baseline)
+    report(results, baseline)
+
+    status = 0
+    for key, result in results.items():
+        for name, differences in result['mismatches'].items():
+            for template, line in differences:
+                print(f'mismatch: {key} {name} {template} line {line}')
+            status = 1
+
+    if args.save:
+        baseline.update({key: {metric: result[metric]
+                               for metric in ('spec', 'time', 'lines')}
+                         for key, result in results.items()})
+        benchmark.save(args.baseline, baseline)
+        return status
+
+    regressions = benchmark.compare(results, baseline, args.threshold)
+    for key, metric, name, before, value in regressions:
+        print(f'regression: {key} {name} {metric} {before:.4g} -> {value:.4g}')
+    return 1 if regressions else status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+federate_py.py
+
+template for a python module that decodes captured interactions
+
+a capture file is a sequence of records, each an interaction index as a
+big-endian unsigned short followed by the interaction's parameters packed
+back to back as HLA basic data, as by codec.Codec. the generated decode()
+turns a whole capture into one column per parameter
+"""
+
+template = \
+'''#!/usr/bin/env python3
+
+"""
+{federate.classname}.py
+
+decode captured {federate.classname} interactions into columns
+
+generated by autoautoauto
+"""
+
+import array
+import itertools
+import operator
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HEADER_SIZE = 2
+
+FIRST = operator.itemgetter(0)
+
+# for each interaction, by index, its name and the name, struct code,
+# numpy dtype and encoded size of each parameter. the struct code is also
+# the array typecode, except for 'c'
+INTERACTIONS = [
+{$interactions}
+    ('{interaction.name}', [
+{$parameters}
+        ('{parameter.name}', '{parameter.typecode}', '{parameter.dtype}', {parameter.encoded_size}),
+{parameters$}
+    ]),
+{interactions$}
+]
+
+
+def layout(parameters):
+    """the size of a record, header included, and the name, struct code,
+    dtype and offset in the record of each parameter, with a Struct that
+    unpacks just that parameter from the start of the record
+
+    the size is None if any parameter is variable-length"""
+    fields, offset = [], HEADER_SIZE
+    for name, code, dtype, size in parameters:
+        if size is None:
+            return None, fields
+        order = dtype[0] if dtype[0] in '<>' else '>'
+        fields.append((name, code, dtype, offset, struct.Struct(order + str(offset) + 'x' + code)))
+        offset += size
+    return offset, fields
+
+
+LAYOUTS = [layout(parameters) for _, parameters in INTERACTIONS]
+
+# the size of the records of each interaction, by index
+SIZES = [size for size, _ in LAYOUTS]
+
+
+def run_length(data, offset, size):
+    """how many records of size bytes from offset on have the same header
+
+    the headers are compared a window at a time, each read with one strided
+    slice, and the window doubles while they all match"""
+    high, low = data[offset:offset + 1], data[offset + 1:offset + 2]
+    run, window = 0, 8
+    while True:
+        start = offset + run * size
+        n = min(window, (len(data) - start) // size)
+        stop = start + n * size
+        matched = min(n - len(data[start:stop:size].lstrip(high)),
+                      n - len(data[start + 1:stop:size].lstrip(low)))
+        run += matched
+        if matched < window:
+            return run
+        window *= 2
+
+
+def scan(data):
+    """the offsets of the records of each interaction, by index
+
+    after three records in a row of the same interaction, the rest of the
+    run is found by run_length rather than one record at a time"""
+    offsets = [[] for _ in INTERACTIONS]
+    appends = [o.append for o in offsets]
+    offset, end, previous, repeats = 0, len(data), None, 0
+    while offset < end:
+        n = data[offset] << 8 | data[offset + 1]
+        size = SIZES[n]
+        if size is None:
+            raise ValueError('cannot decode variable-length interaction ' + INTERACTIONS[n][0])
+        if n != previous:
+            previous, repeats = n, 0
+        elif repeats < 2:
+            repeats += 1
+        else:
+            run = run_length(data, offset, size) or 1
+            offsets[n].extend(range(offset, offset + run * size, size))
+            offset += run * size
+            continue
+        appends[n](offset)
+        offset += size
+    if offset != end:
+        raise ValueError('capture ends inside a record')
+    return offsets
+
+
+def array_columns(data, fields, offsets):
+    columns = dict()
+    for name, code, _, _, field in fields:
+        values = map(FIRST, map(field.unpack_from, itertools.repeat(data, len(offsets)), offsets))
+        # single bytes are kept as struct decodes them
+        columns[name] = list(values) if code == 'c' else array.array(code, values)
+    return columns
+
+
+def numpy_columns(data, fields, size, offsets):
+    record = numpy.dtype(dict(names=[field[0] for field in fields],
+                              formats=[field[2] for field in fields],
+                              offsets=[field[3] for field in fields],
+                              itemsize=size))
+    # a record starting at every byte, so that offsets index them
+    records = numpy.ndarray((len(data) - size + 1,), record, data, strides=(1,))
+    rows = records[numpy.asarray(offsets)]
+    return dict((name, rows[name].astype(numpy.dtype(dtype).newbyteorder('=')))
+                for name, _, dtype, _, _ in fields)
+
+
+def decode(data, *, use_numpy=None):
+    """every parameter of every captured interaction, as columns
+
+    returns a dict of interaction name to a dict of parameter name to an
+    array, a numpy array if numpy is available"""
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    data = bytes(data)
+    result = dict()
+    for (name, _), (size, fields), offsets in zip(INTERACTIONS, LAYOUTS, scan(data)):
+        if not offsets:
+            continue
+        if use_numpy:
+            result[name] = numpy_columns(data, fields, size, offsets)
+        else:
+            result[name] = array_columns(data, fields, offsets)
+    return result
+
+
+def load(filename, **kwargs):
+    with open(filename, 'rb') as f:
+        return decode(f.read(), **kwargs)
+'''
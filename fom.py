@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 
+import functools
+import operator
 import xml.etree.ElementTree as ElementTree
 
+import codec
+from instrument import count, phase
+
 BasicDataTypes = {
     'HLAASCIIchar': 'char',
     'HLAASCIIstring': 'std::string',
@@ -25,6 +30,11 @@ BasicDataTypes = {
 }
 
 
+# buffer capacity reserved up front for a variable-length representation
+VARIABLE_CAPACITY = 64
+
+
+@functools.lru_cache(maxsize=None)
 def variable_case(string):
     first, rest = string[0], string[1:]
     first = first.lower()
@@ -35,6 +45,7 @@ def is_ctype(typename):
     return typename in BasicDataTypes
 
 
+@functools.lru_cache(maxsize=None)
 def get_ctype(typename):
     try:
         return BasicDataTypes[typename]
@@ -42,10 +53,37 @@ def get_ctype(typename):
         raise ValueError(f'{typename} is not a basic datatype')
 
 
+@functools.lru_cache(maxsize=None)
 def to_cliteral(s):
     return f'L"{s}"'
 
+
+class lazy:
+    """an attribute computed on first access and then cached in the slot _name
+
+    classes using lazy attributes must declare the matching _name slots"""
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, cls, name):
+        self.slot = getattr(cls, '_' + name)
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            return self.slot.__get__(obj, cls)
+        except AttributeError:
+            value = self.func(obj)
+            self.slot.__set__(obj, value)
+            return value
+
+
 class FOM:
+    __slots__ = ('filenames', 'filenames_literal')
+
     def __init__(self, *filenames):
         self.filenames = list(filenames)
         self.filenames_literal = self._to_literal()
@@ -75,48 +113,136 @@ class FOM:
 
 
 class XmlFom:
+    __slots__ = ('fom', 'xml', 'parameters', 'attributes',
+                 'datatypes', 'representations', 'classes', 'basenames')
+
     xmlns = {'hla': 'http://standards.ieee.org/IEEE1516-2010'}
 
     def __init__(self, fom: FOM):
         self.fom = fom
+        self.parameters = {}
+        self.attributes = {}
         self.parse()
 
     def parse(self):
         '''import all FOM XML trees into one tree'''
         self.xml = ElementTree.Element('root')
-        for f in self.filenames:
-            newfom = ElementTree.parse(f).getroot()
+        for f in self.fom.filenames:
+            with phase('xml.parse'):
+                newfom = ElementTree.parse(f).getroot()
             self.xml.append(newfom)
+        with phase('xml.index'):
+            self.index()
+
+    def index(self):
+        """index datatypes, representations and classes by name
+
+        the first declaration of a name wins, as with the xpath lookups"""
+        hla = '{' + self.xmlns['hla'] + '}'
+
+        self.datatypes = {}
+        for element in self.xml.iter():
+            datatype = element.findtext(hla + 'dataType')
+            if datatype is not None:
+                self.datatypes.setdefault(
+                    element.findtext(hla + 'name'), datatype)
+
+        self.representations = {}
+        for datatypes in self.xml.iter(hla + 'dataTypes'):
+            for element in datatypes.iter():
+                representation = element.findtext(hla + 'representation')
+                if representation is not None:
+                    self.representations.setdefault(
+                        element.findtext(hla + 'name'), representation)
+
+        self.classes = {}
+        self.basenames = {}
+        for section, kind, member in (('interactions', 'interactionClass', 'parameter'),
+                                      ('objects', 'objectClass', 'attribute')):
+            self.classes[kind] = {}
+            self.basenames[kind] = {}
+            for element in self.xml.iterfind(f'*/{hla}{section}'):
+                self._index_classes(element, hla, kind, member, ())
+
+    def _index_classes(self, element, hla, kind, member, parent):
+        for child in element.iterfind(hla + kind):
+            name = child.findtext(hla + 'name')
+            path = parent + (name,)
+            members = self.classes[kind].setdefault(path, set())
+            members.update(m.findtext(hla + 'name')
+                           for m in child.iterfind(hla + member))
+            self.basenames[kind].setdefault(name, path)
+            self._index_classes(child, hla, kind, member, path)
+
+    def has_member(self, kind, path, name):
+        """whether the class at path, or a class it inherits from, declares name"""
+        classes = self.classes[kind]
+        path = tuple(path)
+        while path:
+            if name in classes[path]:
+                return True
+            path = path[:-1]
+        return False
 
     def find(self, match):
-        return self.xml.find(match, namespaces=self.xmlns)
+        count('xml.queries')
+        with phase('xml.find'):
+            return self.xml.find(match, namespaces=self.xmlns)
 
     def find_type(self, name):
         """find the datatype of a parameter or attribute"""
         if is_ctype(name):
             return name
-        datatype = self.find(f".//*[hla:name='{name}']/hla:dataType")
-        if datatype is None:
+        count('xml.lookups')
+        try:
+            return self.datatypes[name]
+        except KeyError:
             raise LookupError(
                 f"cannot find parameter or attribute {name} in {str(self)}")
-        return datatype.text
 
     def find_representation(self, typename):
         """find the representation of a datatype"""
         if is_ctype(typename):
             return typename
-        representation = self.find(
-            f".//hla:dataTypes//*[hla:name='{typename}']/hla:representation")
-        if representation is None:
+        count('xml.lookups')
+        try:
+            return self.representations[typename]
+        except KeyError:
             raise LookupError(
                 f"cannot find datatype {typename} in {str(self)}")
-        return representation.text
 
+    def parameter(self, name):
+        """the resolved Parameter called name, shared between interactions"""
+        return self._resolved(self.parameters, Parameter, name)
+
+    def attribute(self, name):
+        """the resolved Attribute called name, shared between object classes"""
+        return self._resolved(self.attributes, Attribute, name)
+
+    def _resolved(self, cache, cls, name):
+        try:
+            resolved = cache[name]
+        except KeyError:
+            count('xml.cache_misses')
+            resolved = cache[name] = cls(name)
+            resolved.resolve(self)
+            return resolved
+        count('xml.cache_hits')
+        return resolved
 
-class Interaction:
-    def __init__(self, name, *parameters):
-        """register that this federate subscribes to an InteractionClass"""
 
+class FomClass:
+    """an interaction or object class, named by its full or base name"""
+
+    __slots__ = ('path', 'basename', 'name', 'pathname', 'fullname',
+                 '_literalname', '_varname', '_pathvarname', '_handlename',
+                 '_callbackname')
+
+    root = None
+    kind = None
+    member = None
+
+    def __init__(self, name):
         # parse the name
         # we use a convoluted method to allow lots of ways of specifying a name
         self.path = name.split('.')
@@ -127,56 +253,134 @@ class Interaction:
         self.pathname = '.'.join(self.path[:-1])
 
         if self.pathname:
-            if self.path[0] != 'HLAinteractionRoot':
-                self.path.insert(0, 'HLAinteractionRoot')
+            if self.path[0] != self.root:
+                self.path.insert(0, self.root)
             self.fullname = '.'.join(self.path)
         else:
             self.fullname = None
 
-        self.parameters = list(map(Parameter, parameters))
-
-    def resolve(self, fom: XmlFom):
-        """find the basic datatypes for each parameter. requires xml foms"""
-        for parameter in self.parameters:
-            parameter.resolve(fom)
-
+    def resolve_class(self, fom: XmlFom, members):
+        """find the full name of the class and verify its members"""
+        kind = self.kind[0].upper() + self.kind[1:]
         if self.fullname:
             # verify fullname
-            xpath = '/'.join(
-                ['.//hla:interactions'] +
-                ["hla:interactionClass[hla:name='{}']".format(s) for s in self.path]
-                )
-            xml_element = fom.find(xpath)
-            if not xml_element:
-                raise LookupError(f'Interaction: No InteractionClass {self.fullname} found in {fom}')
+            if tuple(self.path) not in fom.classes[self.kind]:
+                raise LookupError(f'{type(self).__name__}: No {kind} {self.fullname} found in {fom}')
         else:
-            # find using basename
-            xml_element = fom.find(f".//hla:interactionClass[hla:name='{self.basename}']")
-            if not xml_element:
-                raise LookupError(f'Interaction: No InteractionClass {self.basename} found in {fom}')
-            # find fullname and pathname
-            while True:
-                parent = fom.find(f".//hla:interactionClass[hla:name='{self.path[0]}']/../hla:name").text
-                self.path.insert(0, parent)
-                if parent == 'HLAinteractionRoot':
-                    break
+            # find fullname and pathname using basename
+            try:
+                self.path = list(fom.basenames[self.kind][self.basename])
+            except KeyError:
+                raise LookupError(f'{type(self).__name__}: No {kind} {self.basename} found in {fom}')
             self.pathname = '.'.join(self.path[:-1])
             self.fullname = '.'.join(self.path)
 
-        # verify parameters
-        for parameter in self.parameters:
-            if not xml_element.find(f"hla:parameter[hla:name='{parameter.name}']", fom.xmlns):
-                raise LookupError(f'InteractionClass {self.fullname} has no parameter {parameter.name})')
+        for member in members:
+            if not fom.has_member(self.kind, self.path, member.name):
+                raise LookupError(f'{kind} {self.fullname} has no {self.member} {member.name})')
+
+    @lazy
+    def literalname(self):
+        return to_cliteral(self.fullname)
+
+    @lazy
+    def varname(self):
+        return variable_case(self.basename)
+
+    @lazy
+    def pathvarname(self):
+        """the varname of the whole path below the root, which unlike the
+        basename is unique in the fom"""
+        return variable_case(''.join(self.path[1:]))
+
+    @lazy
+    def handlename(self):
+        return f'{self.varname}Handle'
+
+    @lazy
+    def callbackname(self):
+        return f'{self.varname}Callback'
+
+
+class Interaction(FomClass):
+    __slots__ = ('parameters', 'index', '_handle_define', '_callback_arguments',
+                 '_callback_arguments_define', '_enumname', '_dispatchname',
+                 '_dispatch_define', '_parametermapname', '_parametermap_define',
+                 '_handleref', 'signature', '_handle_arguments')
 
-        self.literalname = to_cliteral(self.fullname)
+    root = 'HLAinteractionRoot'
+    kind = 'interactionClass'
+    member = 'parameter'
 
-        self.varname = variable_case(self.basename)
-        self.handlename = f'{self.varname}Handle'
-        self.handle_define = f'InteractionClassHandle {self.handlename}'
-        self.callbackname = f'{self.varname}Callback'
+    def __init__(self, name, *parameters):
+        """register that this federate subscribes to an InteractionClass"""
+        super().__init__(name)
+        self.parameters = list(map(Parameter, parameters))
+        self.index = None
+        self.signature = None
 
-        self.callback_arguments = ', '.join(p.varname for p in self.parameters)
-        self.callback_arguments_define = ', '.join(p.cdefine for p in self.parameters)
+    def resolve(self, fom: XmlFom):
+        """find the basic datatypes for each parameter. requires xml foms"""
+        self.parameters = [ParameterSlot(self, fom.parameter(p.name))
+                           for p in self.parameters]
+        self.resolve_class(fom, self.parameters)
+
+    @lazy
+    def handle_define(self):
+        return f'InteractionClassHandle {self.handlename}'
+
+    @lazy
+    def callback_arguments(self):
+        return ', '.join(p.varname for p in self.parameters)
+
+    @lazy
+    def callback_arguments_define(self):
+        return ', '.join(p.cdefine for p in self.parameters)
+
+    @lazy
+    def handle_arguments(self):
+        return ', '.join(p.handlename for p in self.parameters)
+
+    @lazy
+    def enumname(self):
+        return f'{self.pathvarname}InteractionId'
+
+    @lazy
+    def dispatchname(self):
+        return f'{self.varname}Dispatch'
+
+    @lazy
+    def dispatch_define(self):
+        return f'void {self.dispatchname}(const ParameterHandleValueMap& theParameterValues)'
+
+    @property
+    def parameter_count(self):
+        return len(self.parameters)
+
+    @property
+    def encoded_size(self):
+        """the encoded size of every parameter together, or None if any of
+        them is variable-length"""
+        sizes = [p.encoded_size for p in self.parameters]
+        if None in sizes:
+            return None
+        return sum(sizes)
+
+    @property
+    def capacity(self):
+        return sum(p.capacity for p in self.parameters)
+
+    @lazy
+    def parametermapname(self):
+        return f'{self.varname}Parameters'
+
+    @lazy
+    def parametermap_define(self):
+        return f'ParameterHandleValueMap {self.parametermapname}'
+
+    @lazy
+    def handleref(self):
+        return f'{Federate.interaction_handlesname}[{self.enumname}]'
 
     def __repr__(self):
         args = []
@@ -189,7 +393,56 @@ class Interaction:
         return f'''Interaction({args})'''
 
 
+class ObjectClass(FomClass):
+    __slots__ = ('attributes', '_handle_define', '_callback_arguments',
+                 '_callback_arguments_define')
+
+    root = 'HLAobjectRoot'
+    kind = 'objectClass'
+    member = 'attribute'
+
+    def __init__(self, name, *attributes):
+        """register that this federate uses an ObjectClass"""
+        super().__init__(name)
+        self.attributes = list(map(Attribute, attributes))
+
+    def resolve(self, fom: XmlFom):
+        """find the basic datatypes for each attribute. requires xml foms"""
+        self.attributes = [AttributeSlot(self, fom.attribute(a.name))
+                           for a in self.attributes]
+        self.resolve_class(fom, self.attributes)
+
+    @lazy
+    def handle_define(self):
+        return f'ObjectClassHandle {self.handlename}'
+
+    @lazy
+    def callback_arguments(self):
+        return ', '.join(a.varname for a in self.attributes)
+
+    @lazy
+    def callback_arguments_define(self):
+        return ', '.join(a.cdefine for a in self.attributes)
+
+    def __repr__(self):
+        args = []
+        if self.fullname:
+            args.append(f"'{self.fullname}'")
+        else:
+            args.append(f"'{self.name}'")
+        args += [str(a) for a in self.attributes]
+        args = ', '.join(args)
+        return f'''ObjectClass({args})'''
+
+
 class Parameter:
+    __slots__ = ('name', 'datatype', 'representation',
+                 '_varname', '_literalname', '_handlename', '_handle_define',
+                 '_decodername', '_ctype', '_cdefine', '_decoder_define',
+                 '_enumname', '_encodername', '_encoder_define', '_buffername',
+                 '_buffer_define', '_shared_encodername',
+                 '_shared_decodername')
+
     def __init__(self, name, datatype=None, representation=None):
         self.name = name
         self.datatype = datatype
@@ -204,14 +457,87 @@ class Parameter:
         if representation:
             self.representation = representation
 
-        self.varname = variable_case(self.name)
-        self.literalname = to_cliteral(self.name)
-        self.handlename = f'{self.varname}Handle'
-        self.handle_define = f'ParameterHandle {self.handlename}'
-        self.decodername = f'{self.varname}Decoder'
-        self.ctype = get_ctype(self.representation)
-        self.cdefine = f'{self.ctype} {self.varname}'
-        self.decoder_define = f'{self.representation} {self.decodername}'
+    @lazy
+    def varname(self):
+        return variable_case(self.name)
+
+    @lazy
+    def literalname(self):
+        return to_cliteral(self.name)
+
+    @lazy
+    def handlename(self):
+        return f'{self.varname}Handle'
+
+    @lazy
+    def handle_define(self):
+        return f'ParameterHandle {self.handlename}'
+
+    @lazy
+    def decodername(self):
+        return f'{self.varname}Decoder'
+
+    @lazy
+    def ctype(self):
+        return get_ctype(self.representation)
+
+    @lazy
+    def cdefine(self):
+        return f'{self.ctype} {self.varname}'
+
+    @lazy
+    def decoder_define(self):
+        return f'{self.representation} {self.decodername}'
+
+    @lazy
+    def enumname(self):
+        return f'{self.varname}ParameterId'
+
+    @lazy
+    def encodername(self):
+        return f'{self.varname}Encoder'
+
+    @lazy
+    def encoder_define(self):
+        return f'{self.representation} {self.encodername}'
+
+    @lazy
+    def buffername(self):
+        return f'{self.varname}Buffer'
+
+    @lazy
+    def buffer_define(self):
+        return f'std::vector<Octet> {self.buffername}'
+
+    @lazy
+    def shared_encodername(self):
+        return f'{self.representation}Encoder'
+
+    @lazy
+    def shared_decodername(self):
+        return f'{self.representation}Decoder'
+
+    @property
+    def encoded_size(self):
+        """the encoded size in bytes, or None if it is variable-length"""
+        return codec.size(self.representation)
+
+    @property
+    def capacity(self):
+        """the buffer size to reserve, enough for any fixed-width value"""
+        size = self.encoded_size
+        return VARIABLE_CAPACITY if size is None else size
+
+    @property
+    def typecode(self):
+        """the struct code of the decoded values, as by codec.typecode, or
+        None if it is variable-length"""
+        return codec.typecode(self.representation)
+
+    @property
+    def dtype(self):
+        """the numpy dtype, or None if it is variable-length"""
+        return codec.dtype(self.representation)
 
     def __repr__(self):
         args = [f"'{self.name}'"]
@@ -219,31 +545,328 @@ class Parameter:
             args += [f"datatype='{self.datatype}'"]
         if self.representation:
             args += [f"representation='{self.representation}'"]
-        return f"Parameter({', '.join(args)})"
+        return f"{type(self).__name__}({', '.join(args)})"
+
+
+class Attribute(Parameter):
+    __slots__ = ()
+
+    @lazy
+    def handle_define(self):
+        return f'AttributeHandle {self.handlename}'
+
+
+class ParameterSlot:
+    """a parameter as used by one interaction
+
+    resolved parameters are shared between interactions, but each
+    interaction looks up its own handle for them. the slot holds what
+    belongs to the pair, and reads everything else from the parameter.
+    index is the federate's number for the parameter, kept here since the
+    parameter itself is shared by every federate on the same xml fom"""
+
+    __slots__ = ('parameter', 'interaction', 'slot', 'index', '_slotname',
+                 '_handleref')
+
+    def __init__(self, interaction, parameter):
+        self.interaction = interaction
+        self.parameter = parameter
+        self.slot = None
+        self.index = None
+
+    @lazy
+    def slotname(self):
+        return f'{self.interaction.pathvarname}{self.parameter.name}Slot'
+
+    @lazy
+    def handleref(self):
+        return f'{Federate.parameter_handlesname}[{self.slotname}]'
+
+    def __repr__(self):
+        return repr(self.parameter)
+
+
+class AttributeSlot:
+    """an attribute as used by one object class
+
+    like parameters, resolved attributes are shared between object classes,
+    and each class looks up its own handle for them"""
+
+    __slots__ = ('attribute', 'objectclass', '_handlename', '_handle_define')
+
+    def __init__(self, objectclass, attribute):
+        self.objectclass = objectclass
+        self.attribute = attribute
+
+    @lazy
+    def handlename(self):
+        return f'{self.objectclass.varname}{self.attribute.name}Handle'
+
+    @lazy
+    def handle_define(self):
+        return f'AttributeHandle {self.handlename}'
+
+    def __repr__(self):
+        return repr(self.attribute)
+
+
+def forward(slot, member, name):
+    """give slot a property reading each public attribute of member that it
+    does not have itself from its own member called name"""
+    # C level properties are much faster to format than __getattr__
+    for attr in dir(member):
+        if not attr.startswith('_') and not hasattr(slot, attr):
+            setattr(slot, attr, property(operator.attrgetter(f'{name}.{attr}')))
+
+
+forward(ParameterSlot, Parameter, 'parameter')
+forward(AttributeSlot, Attribute, 'attribute')
+
+
+class Representation:
+    """a basic representation, with one encoder and decoder shared by every
+    parameter that has it"""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def ctype(self):
+        return get_ctype(self.name)
+
+    @property
+    def encodername(self):
+        return f'{self.name}Encoder'
+
+    @property
+    def decodername(self):
+        return f'{self.name}Decoder'
+
+    @property
+    def encoder_define(self):
+        return f'{self.name} {self.encodername}'
+
+    @property
+    def decoder_define(self):
+        return f'{self.name} {self.decodername}'
+
+    def __repr__(self):
+        return f"Representation('{self.name}')"
+
+
+class Signature:
+    """the interactions whose parameters have the same representations
+
+    the parameters of a signature are placeholders v0, v1, ... for the
+    parameters of its interactions, so one helper can encode or decode all
+    of them"""
+
+    __slots__ = ('name', 'representations', 'parameters', 'interactions',
+                 '_decodername', '_encodername', '_decoder_define',
+                 '_encoder_define')
+
+    def __init__(self, representations):
+        self.representations = tuple(representations)
+        self.name = '_'.join(self.representations) or 'empty'
+        self.parameters = [Parameter(f'v{n}', representation=r)
+                           for n, r in enumerate(self.representations)]
+        self.interactions = []
+
+    @lazy
+    def decodername(self):
+        return f'decode_{self.name}'
+
+    @lazy
+    def encodername(self):
+        return f'encode_{self.name}'
+
+    @lazy
+    def decoder_define(self):
+        args = (['const ParameterHandleValueMap& theParameterValues']
+                + [f'ParameterHandle {p.handlename}' for p in self.parameters]
+                + [f'{p.ctype}& {p.varname}' for p in self.parameters])
+        return f"bool {self.decodername}({', '.join(args)})"
+
+    @lazy
+    def encoder_define(self):
+        args = (['ParameterHandleValueMap& theParameterValues']
+                + [f'ParameterHandle {p.handlename}' for p in self.parameters]
+                + [f'const {p.ctype}& {p.varname}' for p in self.parameters])
+        return f"void {self.encodername}({', '.join(args)})"
+
+    def __repr__(self):
+        return f"Signature({', '.join(self.representations)})"
+
 
 class Federate:
+    __slots__ = ('classname', 'fom', 'interactions', 'objectclasses', 'xml',
+                 'unique_parameters', '_interaction_enum_define',
+                 '_parameter_enum_define', '_dispatch_define',
+                 '_parameter_dispatch_define', '_interaction_handles_define',
+                 '_parameter_handles_define', '_interaction_names_define',
+                 '_parameter_names_define', '_parameter_owners_define',
+                 '_parameter_slot_enum_define', 'parameter_slots',
+                 'parameter_ids', 'representations', 'signatures')
+
+    # incoming interactions and parameters are dispatched by looking their
+    # handles up in these hash tables, filled in once the handles are known.
+    # parameter handles are only unique within their interaction class, so
+    # there is one parameter table for each interaction
+    dispatchname = 'interactionDispatch'
+    parameter_dispatchname = 'parameterDispatch'
+    handle_hash_define = ('struct HandleHash { template <class Handle> '
+                          'size_t operator()(const Handle& handle) const '
+                          '{ return static_cast<size_t>(handle.hash()); } }')
+
+    # handles are resolved in one loop over static name tables into arrays
+    # indexed by the generated enums. each interaction has its own slot for
+    # the handle of each of its parameters
+    interaction_handlesname = 'interactionHandles'
+    parameter_handlesname = 'parameterHandles'
+    interaction_namesname = 'interactionNames'
+    parameter_namesname = 'parameterNames'
+    parameter_ownersname = 'parameterInteractions'
+
     def __init__(self, *args):
+        self.classname = None
         self.fom = FOM()
         self.interactions = []
+        self.objectclasses = []
+        self.unique_parameters = []
+        self.parameter_slots = []
+        self.parameter_ids = {}
+        self.representations = {}
+        self.signatures = {}
+
+        if args and isinstance(args[0], str):
+            self.classname, *args = args
 
+        xml = None
         for arg in args:
             if isinstance(arg, FOM):
                 self.fom.extend(arg)
+            elif isinstance(arg, XmlFom):
+                # already parsed, e.g. to time parsing on its own
+                self.fom.extend(arg.fom)
+                xml = arg
             elif isinstance(arg, Interaction):
                 self.interactions.append(arg)
+            elif isinstance(arg, ObjectClass):
+                self.objectclasses.append(arg)
             else:
                 raise ValueError(f'Unrecognised argument {arg}')
 
-        self.xml = XmlFom(self.fom)
-        self.xml.parse()
+        self.xml = xml if xml is not None else XmlFom(self.fom)
         self.resolve()
 
     def __repr__(self):
         fom = str(self.fom)
-        interactions = ', '.join(str(i) for i in self.interactions)
-        return f"Federate({fom}, {interactions})"
+        classes = ', '.join(str(c) for c in self.interactions + self.objectclasses)
+        if self.classname:
+            return f"Federate('{self.classname}', {fom}, {classes})"
+        return f"Federate({fom}, {classes})"
 
     def resolve(self):
+        with phase('fom.resolve'):
+            for interaction in self.interactions:
+                interaction.resolve(self.xml)
+            for objectclass in self.objectclasses:
+                objectclass.resolve(self.xml)
+        with phase('fom.group'):
+            self.number()
+            self.group()
+
+    def number(self):
+        """give each interaction, and each distinct parameter, a dense index
+
+        the indexes are the values of the generated enums, so dispatch can
+        switch on them once a handle has been looked up"""
+        for n, interaction in enumerate(self.interactions):
+            interaction.index = n
+        self.parameter_slots = [p for i in self.interactions for p in i.parameters]
+        for n, slot in enumerate(self.parameter_slots):
+            slot.slot = n
+        # resolved parameters are shared, so each is numbered once, and
+        # with other federates on the same xml fom: the numbers stay here
+        self.unique_parameters = list(dict.fromkeys(
+            slot.parameter for slot in self.parameter_slots))
+        self.parameter_ids = {p: n for n, p in enumerate(self.unique_parameters)}
+        for slot in self.parameter_slots:
+            slot.index = self.parameter_ids[slot.parameter]
+
+    def group(self):
+        """group parameters by representation and interactions by signature
+
+        both are dicts keyed by representation, so templates can declare one
+        shared encoder, decoder or helper for each instead of one for every
+        parameter or interaction"""
+        self.representations = {}
+        self.signatures = {}
         for interaction in self.interactions:
-            interaction.resolve(self.xml)
+            representations = tuple(p.representation for p in interaction.parameters)
+            for r in representations:
+                if r not in self.representations:
+                    self.representations[r] = Representation(r)
+            signature = self.signatures.get(representations)
+            if signature is None:
+                signature = self.signatures[representations] = Signature(representations)
+            signature.interactions.append(interaction)
+            interaction.signature = signature
+
+    # the enums are unscoped, so their names say which enum they are in, and
+    # interactions are named by their whole path
+    @lazy
+    def interaction_enum_define(self):
+        names = [i.enumname for i in self.interactions] + ['InteractionCount']
+        return f"enum InteractionId {{ {', '.join(names)} }}"
+
+    @lazy
+    def parameter_enum_define(self):
+        names = [p.enumname for p in self.unique_parameters] + ['ParameterCount']
+        return f"enum ParameterId {{ {', '.join(names)} }}"
+
+    @lazy
+    def parameter_slot_enum_define(self):
+        names = [s.slotname for s in self.parameter_slots] + ['ParameterSlotCount']
+        return f"enum ParameterSlotId {{ {', '.join(names)} }}"
+
+    @lazy
+    def dispatch_define(self):
+        return ('std::unordered_map<InteractionClassHandle, InteractionId, HandleHash> '
+                f'{self.dispatchname}')
+
+    @lazy
+    def parameter_dispatch_define(self):
+        return ('std::unordered_map<ParameterHandle, ParameterId, HandleHash> '
+                f'{self.parameter_dispatchname}[InteractionCount]')
+
+    @lazy
+    def interaction_handles_define(self):
+        return f'InteractionClassHandle {self.interaction_handlesname}[InteractionCount]'
+
+    @lazy
+    def parameter_handles_define(self):
+        return f'ParameterHandle {self.parameter_handlesname}[ParameterSlotCount]'
+
+    @lazy
+    def interaction_names_define(self):
+        names = ', '.join(i.literalname for i in self.interactions)
+        return ('static constexpr const wchar_t* '
+                f'{self.interaction_namesname}[InteractionCount] = {{ {names} }}')
+
+    @lazy
+    def parameter_names_define(self):
+        names = ', '.join(s.literalname for s in self.parameter_slots)
+        return ('static constexpr const wchar_t* '
+                f'{self.parameter_namesname}[ParameterSlotCount] = {{ {names} }}')
+
+    @lazy
+    def parameter_owners_define(self):
+        """the interaction the handle in each parameter slot is looked up
+        through"""
+        names = ', '.join(s.interaction.enumname for s in self.parameter_slots)
+        return ('static constexpr InteractionId '
+                f'{self.parameter_ownersname}[ParameterSlotCount] = {{ {names} }}')
 
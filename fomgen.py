@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+fomgen.py
+
+generate synthetic IEEE 1516-2010 FOMs of any size, for benchmarks
+"""
+
+import os
+import random
+import xml.etree.ElementTree as ElementTree
+
+import codec
+from fom import Interaction, ObjectClass
+
+XMLNS = 'http://standards.ieee.org/IEEE1516-2010'
+
+# representations given to generated datatypes
+REPRESENTATIONS = sorted(codec.StructCodes) + ['HLAunicodeString', 'HLAASCIIstring']
+
+
+class FomSpec:
+    '''the shape of a synthetic FOM
+
+    interactions and object classes are shared out between the modules,
+    each under a chain of depth - 1 intermediate classes, and every
+    parameter and attribute has one of the datatypes, which are all
+    declared in the first module. the shared parameters and attributes are
+    declared on the class above the interactions or object classes of each
+    module, so every class in the module inherits them'''
+
+    __slots__ = ('modules', 'depth', 'interactions', 'parameters',
+                 'objects', 'attributes', 'datatypes', 'shared', 'seed')
+
+    def __init__(self, *, modules=1, depth=1, interactions=10, parameters=3,
+                 objects=0, attributes=3, datatypes=10, shared=0, seed=0):
+        self.modules = modules
+        self.depth = depth
+        self.interactions = interactions
+        self.parameters = parameters
+        self.objects = objects
+        self.attributes = attributes
+        self.datatypes = datatypes
+        self.shared = shared
+        self.seed = seed
+
+    def __repr__(self):
+        args = ', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)
+        return f'FomSpec({args})'
+
+    def asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def element(parent, tag, text=None):
+    e = ElementTree.SubElement(parent, tag)
+    if text is not None:
+        e.text = text
+    return e
+
+
+def shared_names(spec, module):
+    return [f'Module{module}Shared{p}' for p in range(spec.shared)]
+
+
+def shared_attribute_names(spec, module):
+    return [f'Module{module}SharedAttribute{a}' for a in range(spec.shared)]
+
+
+def interaction_names(spec):
+    '''the (module, basename, parameter names) of each interaction, with
+    the parameters it inherits first'''
+    for n in range(spec.interactions):
+        m = n % spec.modules
+        parameters = [f'Interaction{n}Parameter{p}' for p in range(spec.parameters)]
+        yield m, f'Interaction{n}', shared_names(spec, m) + parameters
+
+
+def object_names(spec):
+    '''the (module, basename, attribute names) of each object class, with
+    the attributes it inherits first'''
+    for n in range(spec.objects):
+        m = n % spec.modules
+        attributes = [f'Object{n}Attribute{a}' for a in range(spec.attributes)]
+        yield m, f'Object{n}', shared_attribute_names(spec, m) + attributes
+
+
+def classes(section, kind, rootname, module, depth):
+    '''the class depth - 1 levels below a new root class in section'''
+    parent = element(section, kind)
+    element(parent, 'name', rootname)
+    for level in range(depth - 1):
+        parent = element(parent, kind)
+        element(parent, 'name', f'Module{module}Level{level}')
+    return parent
+
+
+def members(parent, tag, names, datatypes, rng, index=None):
+    '''add a member called each of names to parent, with a random datatype
+
+    the members are inserted from index if it is given, else appended'''
+    for n, name in enumerate(names):
+        member = ElementTree.Element(tag)
+        element(member, 'name', name)
+        element(member, 'dataType', rng.choice(datatypes)[0])
+        if index is None:
+            parent.append(member)
+        else:
+            parent.insert(index + n, member)
+
+
+def generate(spec):
+    '''the ElementTree root of each module of spec
+
+    the same spec always gives the same FOM'''
+    rng = random.Random(spec.seed)
+    datatypes = [(f'Datatype{n}', rng.choice(REPRESENTATIONS))
+                 for n in range(spec.datatypes)]
+
+    roots = []
+    leaves = []
+    object_leaves = []
+    for m in range(spec.modules):
+        root = ElementTree.Element('objectModel', xmlns=XMLNS)
+        element(element(root, 'modelIdentification'), 'name', f'Module{m}')
+        if spec.objects:
+            object_leaves.append(classes(element(root, 'objects'), 'objectClass',
+                                         'HLAobjectRoot', m, spec.depth))
+        leaves.append(classes(element(root, 'interactions'), 'interactionClass',
+                              'HLAinteractionRoot', m, spec.depth))
+        roots.append(root)
+
+    for m, name, parameters in interaction_names(spec):
+        interaction = element(leaves[m], 'interactionClass')
+        element(interaction, 'name', name)
+        members(interaction, 'parameter', parameters[spec.shared:], datatypes, rng)
+
+    # members come before subclasses, just after the name
+    for m, leaf in enumerate(leaves):
+        members(leaf, 'parameter', shared_names(spec, m), datatypes, rng, index=1)
+
+    for m, name, attributes in object_names(spec):
+        objectclass = element(object_leaves[m], 'objectClass')
+        element(objectclass, 'name', name)
+        members(objectclass, 'attribute', attributes[spec.shared:], datatypes, rng)
+
+    for m, leaf in enumerate(object_leaves):
+        members(leaf, 'attribute', shared_attribute_names(spec, m), datatypes, rng,
+                index=1)
+
+    simple = element(element(roots[0], 'dataTypes'), 'simpleDataTypes')
+    for name, representation in datatypes:
+        data = element(simple, 'simpleData')
+        element(data, 'name', name)
+        element(data, 'representation', representation)
+
+    return roots
+
+
+def write(spec, directory):
+    '''write the modules of spec into directory and return their filenames'''
+    filenames = []
+    for m, root in enumerate(generate(spec)):
+        filename = os.path.join(directory, f'Module{m}.xml')
+        ElementTree.ElementTree(root).write(
+            filename, encoding='UTF-8', xml_declaration=True)
+        filenames.append(filename)
+    return filenames
+
+
+def interactions(spec):
+    '''the fom.Interaction arguments for a federate using every interaction'''
+    return [Interaction(name, *parameters)
+            for _, name, parameters in interaction_names(spec)]
+
+
+def objectclasses(spec):
+    '''the fom.ObjectClass arguments for a federate using every object class'''
+    return [ObjectClass(name, *attributes)
+            for _, name, attributes in object_names(spec)]
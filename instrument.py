@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""
+instrument.py
+
+time and count the phases of code generation
+
+nothing is recorded unless a Profile is active
+
+    with Profile() as profile:
+        run(federate, template, out)
+    profile.report()
+
+or, to print the report as json
+
+    profile.write('json')
+"""
+
+import json
+import sys
+import time
+
+# the Profile being recorded, if any
+active = None
+
+
+class Phase:
+    '''times one phase for a profile'''
+
+    __slots__ = ('profile', 'name', 'start')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # report phases in the order they start
+        self.profile.times.setdefault(self.name, 0.0)
+        self.start = self.profile.clock()
+
+    def __exit__(self, *exc):
+        self.profile.record(self.name, self.profile.clock() - self.start)
+
+
+class Null:
+    '''what phase() returns when nothing is being profiled'''
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+null = Null()
+
+
+def phase(name):
+    '''a context manager timing name for the active profile, if any
+
+    phases can nest, and the time of a phase includes the phases inside it'''
+    if active is None:
+        return null
+    return Phase(active, name)
+
+
+def count(name, n=1):
+    '''add n to the counter name of the active profile, if any'''
+    if active is not None:
+        active.counts[name] = active.counts.get(name, 0) + n
+
+
+class Profile:
+    '''the total time and number of calls of each phase, and counters
+
+    each timer is called with the name and duration in seconds of every
+    phase as it ends, e.g. to forward them to a tracing tool'''
+
+    __slots__ = ('timers', 'clock', 'times', 'calls', 'counts', 'total',
+                 '_start', '_previous')
+
+    def __init__(self, *timers, clock=time.perf_counter):
+        self.timers = timers
+        self.clock = clock
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+        self.total = 0.0
+
+    def __enter__(self):
+        global active
+        self._previous, active = active, self
+        self._start = self.clock()
+        return self
+
+    def __exit__(self, *exc):
+        global active
+        self.total += self.clock() - self._start
+        active = self._previous
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def record(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        for timer in self.timers:
+            timer(name, seconds)
+
+    def asdict(self):
+        return {'total': self.total,
+                'phases': {name: {'calls': self.calls[name], 'time': t}
+                           for name, t in self.times.items()},
+                'counts': dict(self.counts)}
+
+    def report(self, out=sys.stdout):
+        print(f'  {"phase":28} {"calls":>8} {"time (ms)":>10} {"%":>6}', file=out)
+        for name, t in self.times.items():
+            share = 100 * t / self.total if self.total else 0
+            print(f'  {name:28} {self.calls[name]:8} {t * 1000:10.1f} '
+                  f'{share:6.1f}', file=out)
+        print(f'  {"total":28} {"":8} {self.total * 1000:10.1f}', file=out)
+        for name, n in self.counts.items():
+            print(f'  {name:28} {n:8}', file=out)
+
+    def write(self, format='text', out=None):
+        '''print the report as a text table, or asdict() as json'''
+        out = out or sys.stdout
+        if format == 'json':
+            json.dump(self.asdict(), out, indent=2)
+            print(file=out)
+        else:
+            self.report(out)
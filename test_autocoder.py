@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 
+import contextlib
+import io
+import json
+import os
+import tempfile
 import unittest
 
+import fomgen
 from fom import Federate, FOM, Interaction
-from autocoder import name_re, attribute_walker, find_list_property
+from autocoder import name_re, attribute_walker, find_list_property, plural, singular
+from autocoder import validate, TemplateError, parse, run, shard_of, main
 
 
 class ReTester(unittest.TestCase):
@@ -92,5 +99,146 @@ class FindListPropertyTester(unittest.TestCase):
             'federate.interactions.parameters')
 
 
+class ValidateTester(unittest.TestCase):
+
+    federate = Federate(
+        "Federate", FOM("FuelEconomyBase.xml"),
+        Interaction("LoadScenario", "ScenarioName", "InitialFuelAmount"),
+        Interaction("Start", "TimeScaleFactor"))
+
+    def assertErrorLines(self, seq, lines):
+        with self.assertRaises(TemplateError) as cm:
+            validate(self.federate, seq)
+        self.assertEqual([n for n, _ in cm.exception.errors], lines)
+
+    def test_valid(self):
+        validate(self.federate, [
+            '{interaction.handlename}',
+            '{$interactions}',
+            '{$parameters}',
+            '{parameter.varname} {interaction.name}',
+            '{parameters$}',
+            '{interactions$}'])
+
+    def test_misspelled_attribute(self):
+        self.assertErrorLines(['{federate.fom}', '{parameter.varnme}'], [2])
+
+    def test_unknown_name(self):
+        self.assertErrorLines(['{widget.name}'], [1])
+
+    def test_all_errors_reported(self):
+        self.assertErrorLines([
+            '{$interactions}',
+            '{interaction.handelname}',
+            '{parameter.varname}',
+            '{interactions$}',
+            '{parameters$}',
+            '{$interactions}'], [2, 3, 5, 6])
+
+    def test_interaction(self):
+        # a parameters block outside {$interactions} is over the parameters
+        # of the interaction given, if there is one
+        template = '{$parameters}\n{parameter.name}\n{parameters$}\n'
+        self.assertEqual(
+            parse(self.federate, template, interaction=self.federate.interactions[0]),
+            'ScenarioName\nInitialFuelAmount\n')
+        self.assertEqual(parse(self.federate, template),
+                         'ScenarioName\nInitialFuelAmount\nTimeScaleFactor\n')
+
+    def test_other_blocks(self):
+        validate(self.federate, [
+            '{$signatures}',
+            '{signature.decodername}',
+            '{$parameters}',
+            '{parameter.shared_decodername}',
+            '{parameters$}',
+            '{signatures$}'])
+        self.assertErrorLines([
+            '{$widgets}',
+            '{widgets$}',
+            '{$representations}',
+            '{representation.decodername} {interaction.name}',
+            '{representations$}'], [1, 4])
+        self.assertErrorLines([
+            '{$representations}',
+            '{$parameters}',
+            '{parameter.name}',
+            '{parameters$}',
+            '{representations$}'], [2])
+
+
+class ShardTester(unittest.TestCase):
+
+    federate = Federate(
+        "Federate", FOM("FuelEconomyBase.xml"),
+        Interaction("LoadScenario", "ScenarioName", "InitialFuelAmount"),
+        Interaction("Start", "TimeScaleFactor"))
+
+    template = (
+        '#include "{federate.classname}.h"\n'
+        '// shard {federate.shard} of {federate.shards}\n'
+        '{$interactions}\n'
+        'void {federate.classname}::{interaction.callbackname}() {{}}\n'
+        '{interactions$}\n')
+
+    header = 'class {federate.classname};\n'
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, 'Federate.cpp')
+            outs = run(self.federate, self.template, out,
+                       shards=3, header=self.header)
+            self.assertEqual([os.path.basename(o) for o in outs],
+                             ['Federate.h', 'Federate_0.cpp',
+                              'Federate_1.cpp', 'Federate_2.cpp'])
+            text = ''
+            for o in outs[1:]:
+                with open(o) as f:
+                    text += f.read()
+            for interaction in self.federate.interactions:
+                self.assertEqual(text.count(interaction.callbackname), 1)
+                shard = shard_of(interaction, 3)
+                with open(outs[1 + shard]) as f:
+                    self.assertIn(interaction.callbackname, f.read())
+
+            # unchanged shards are not rewritten
+            os.utime(outs[1], ns=(0, 0))
+            run(self.federate, self.template, out, shards=3, header=self.header)
+            self.assertEqual(os.stat(outs[1]).st_mtime_ns, 0)
+
+    def test_stable(self):
+        # the shard only depends on the interaction's own name
+        start = Interaction("HLAinteractionRoot.Start")
+        self.assertEqual(shard_of(start, 8),
+                         shard_of(self.federate.interactions[1], 8))
+
+
+class PluralTester(unittest.TestCase):
+
+    def test_plural(self):
+        self.assertEqual(plural('interaction'), 'interactions')
+        self.assertEqual(plural('objectclass'), 'objectclasses')
+
+    def test_singular(self):
+        for name in ('interaction', 'objectclass', 'phase', 'case', 'address'):
+            self.assertEqual(singular(plural(name)), name)
+
+
+class MainTester(unittest.TestCase):
+
+    def test_profile(self):
+        spec = fomgen.FomSpec(interactions=2, parameters=2)
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, 'Capture.py')
+            report = io.StringIO()
+            with contextlib.redirect_stdout(report):
+                main(['federate_py', out, '--fom', *fomgen.write(spec, d),
+                      '--interaction', 'Interaction0', 'Interaction0Parameter1',
+                      '--interaction', 'Interaction1', '--profile', 'json'])
+            with open(out) as f:
+                self.assertIn("('Interaction0', [", f.read())
+        self.assertIn('template.walk', json.loads(report.getvalue())['phases'])
+
+
 if __name__ == '__main__':
     unittest.main()
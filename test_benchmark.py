@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import benchmark
+import fomgen
+
+
+class CompareTester(unittest.TestCase):
+
+    baseline = {'small': {'spec': {'interactions': 1},
+                          'time': {'walk': 1.0, 'run': 1.0},
+                          'peak': {'walk': 100}}}
+
+    def test_regressions(self):
+        results = {'small': {'spec': {'interactions': 1},
+                             'time': {'walk': 1.1, 'run': 2.0},
+                             'peak': {'walk': 200}}}
+        self.assertEqual(benchmark.compare(results, self.baseline, 0.25),
+                         [('small', 'time', 'run', 1.0, 2.0),
+                          ('small', 'peak', 'walk', 100, 200)])
+
+    def test_different_spec(self):
+        results = {'small': {'spec': {'interactions': 2},
+                             'time': {'walk': 5.0}, 'peak': {}}}
+        self.assertEqual(benchmark.compare(results, self.baseline), [])
+
+
+class ParallelTester(unittest.TestCase):
+
+    def test_same_output(self):
+        # parallel() raises if the output differs
+        times = benchmark.parallel(fomgen.FomSpec(interactions=20), 2, repeat=1)
+        self.assertEqual(set(times), {'serial', 'parallel', 'start'})
+
+
+class DecodeTester(unittest.TestCase):
+
+    def test_same_output(self):
+        # decode() raises if the columns differ
+        times = benchmark.decode(fomgen.FomSpec(interactions=10, parameters=3), 1000,
+                                 repeat=1)
+        self.assertLessEqual({'unpack', 'array'}, set(times))
+
+
+if __name__ == '__main__':
+    unittest.main()
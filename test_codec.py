@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import struct
+import unittest
+
+from fom import Interaction, Parameter
+import codec
+from codec import Codec, codecs
+
+
+def interaction(name, **representations):
+    i = Interaction(name)
+    i.parameters = [Parameter(n, representation=r)
+                    for n, r in representations.items()]
+    return i
+
+
+class CodecTester(unittest.TestCase):
+
+    start = interaction('Start', TimeScaleFactor='HLAfloat32BE',
+                        Count='HLAinteger32BE', Flag='HLAoctet')
+    mixed = interaction('Mixed', A='HLAinteger16BE', B='HLAinteger16LE',
+                        C='HLAfloat64LE')
+
+    def test_layout(self):
+        codec = Codec(self.start)
+        self.assertEqual(codec.size, 9)
+        self.assertEqual(codec.pack(0.5, 1, 2), struct.pack('>fiB', 0.5, 1, 2))
+        self.assertEqual(codec.unpack(codec.pack(0.5, 1, 2)), (0.5, 1, 2))
+
+    def test_mixed_byte_order(self):
+        codec = Codec(self.mixed)
+        packed = codec.pack(1, 2, 1.5)
+        self.assertEqual(packed, struct.pack('>h', 1) + struct.pack('<hd', 2, 1.5))
+        self.assertEqual(codec.unpack(packed), (1, 2, 1.5))
+
+    def test_many(self):
+        for i in (self.start, self.mixed):
+            codec = Codec(i)
+            records = [(n, n * 2, n % 256) for n in range(100)]
+            buffer = codec.pack_many(records, offset=3)
+            self.assertEqual(len(buffer), 3 + 100 * codec.size)
+            self.assertEqual(list(codec.unpack_many(buffer, offset=3)),
+                             [tuple(float(v) if p.representation.startswith('HLAfloat') else v
+                                    for v, p in zip(r, i.parameters))
+                              for r in records])
+
+    def test_variable_length(self):
+        text = interaction('Load', ScenarioName='HLAunicodeString')
+        with self.assertRaises(ValueError):
+            Codec(text)
+
+        class federate:
+            interactions = [text, self.start]
+        self.assertEqual(list(codecs(federate)), ['Start'])
+
+
+class RepresentationTester(unittest.TestCase):
+
+    def test_consistent(self):
+        for representation, (order, code) in codec.StructCodes.items():
+            p = Parameter('P', representation=representation)
+            self.assertEqual(p.encoded_size,
+                             Codec(interaction('I', P=representation)).size)
+            self.assertEqual(p.typecode, code)
+            self.assertEqual(p.dtype, (order or '|') + p.dtype[1] + str(p.encoded_size))
+
+    def test_char(self):
+        p = Parameter('P', representation='HLAASCIIchar')
+        self.assertEqual((p.encoded_size, p.typecode, p.dtype), (1, 'c', '|S1'))
+        self.assertEqual(Codec(interaction('I', P='HLAASCIIchar')).unpack(b'a'),
+                         (b'a',))
+
+    def test_variable_length(self):
+        p = Parameter('P', representation='HLAunicodeString')
+        self.assertEqual((p.encoded_size, p.typecode, p.dtype), (None, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
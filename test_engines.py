@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import engines
+import fomgen
+
+
+class MismatchTester(unittest.TestCase):
+
+    reference = {'a': ['x\n', 'y\n'], 'b': ['z\n']}
+
+    def test_same(self):
+        self.assertEqual(engines.mismatches(self.reference, dict(self.reference)), [])
+
+    def test_different(self):
+        output = {'a': ['x\n', 'w\n'], 'b': ['z\n', 'z\n']}
+        self.assertEqual(engines.mismatches(self.reference, output),
+                         [('a', 2), ('b', 2)])
+
+
+class MeasureTester(unittest.TestCase):
+
+    spec = fomgen.FomSpec(modules=2, depth=2, interactions=4, parameters=2)
+
+    def test_agree(self):
+        result = engines.measure(self.spec, list(engines.ENGINES.values()),
+                                 engines.CORPUS, repeat=1)
+        self.assertEqual(result['mismatches'], {})
+        self.assertEqual(set(result['time']), set(engines.ENGINES))
+        self.assertEqual(len(set(result['lines'].values())), 1)
+
+    def test_disagree(self):
+        corpus = {'implicit': '{interaction.name}\n{parameter.name}\n'}
+        result = engines.measure(self.spec, list(engines.ENGINES.values()),
+                                 corpus, repeat=1)
+        self.assertEqual(list(result['mismatches']), ['hla_autocoder'])
+
+
+if __name__ == '__main__':
+    unittest.main()
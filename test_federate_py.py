@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import random
+import struct
+import tempfile
+import unittest
+
+from fom import Federate, FOM, XmlFom
+from autocoder import parse
+from codec import Codec
+import federate_py
+import fomgen
+from test_codec import interaction
+
+
+class FederatePyTester(unittest.TestCase):
+
+    # Interaction1 has a variable-length parameter, Interaction2 a float32LE
+    # and an octetPairBE
+    spec = fomgen.FomSpec(interactions=4, parameters=2, datatypes=8, seed=1)
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as d:
+            cls.federate = Federate('Federate', XmlFom(FOM(*fomgen.write(cls.spec, d))),
+                                    *fomgen.interactions(cls.spec))
+
+    def setUp(self):
+        self.module = {}
+        exec(parse(self.federate, federate_py.template), self.module)
+        fixed = self.federate.interactions[2]
+        codec = Codec(fixed)
+        header = struct.Struct('>H')
+        self.capture = b''.join(header.pack(fixed.index) + codec.pack(n / 4, n)
+                                for n in range(10))
+
+    def test_layout(self):
+        self.assertEqual(self.module['INTERACTIONS'][2],
+                         ('Interaction2', [('Interaction2Parameter0', 'f', '<f4', 4),
+                                           ('Interaction2Parameter1', 'H', '>u2', 2)]))
+        self.assertEqual(self.module['INTERACTIONS'][1][1][0],
+                         ('Interaction1Parameter0', 'None', 'None', None))
+
+    def test_array(self):
+        columns = self.module['decode'](self.capture, use_numpy=False)
+        self.assertEqual(list(columns), ['Interaction2'])
+        self.assertEqual(list(columns['Interaction2']['Interaction2Parameter0']),
+                         [n / 4 for n in range(10)])
+        self.assertEqual(list(columns['Interaction2']['Interaction2Parameter1']),
+                         list(range(10)))
+
+    def test_numpy(self):
+        if self.module['numpy'] is None:
+            self.skipTest('numpy is not installed')
+        columns = self.module['decode'](self.capture, use_numpy=True)
+        self.assertEqual(columns['Interaction2']['Interaction2Parameter0'].tolist(),
+                         [n / 4 for n in range(10)])
+
+    def test_variable_length(self):
+        capture = struct.pack('>H', 1) + b'\0\0\0\0'
+        with self.assertRaises(ValueError):
+            self.module['decode'](capture)
+
+
+class ThroughputTester(unittest.TestCase):
+    '''decode() against a loop unpacking one record at a time
+
+    benchmark.py --decode times them'''
+
+    class federate:
+        classname = 'Capture'
+        interactions = [
+            interaction('A', X='HLAfloat32BE', Y='HLAinteger32BE', Z='HLAoctet'),
+            interaction('B', P='HLAinteger16LE', Q='HLAfloat64LE', R='HLAinteger16BE'),
+            interaction('C', C='HLAASCIIchar', D='HLAfloat64BE')]
+
+    def setUp(self):
+        self.module = {}
+        exec(parse(self.federate, federate_py.template), self.module)
+        self.codecs = [Codec(i) for i in self.federate.interactions]
+        rng = random.Random(0)
+        # interleaved records, then runs of each interaction
+        indexes = [rng.randrange(3) for _ in range(20000)]
+        indexes += [n for n in range(3) for _ in range(20000)]
+        self.capture = b''.join(
+            struct.pack('>H', n) + self.codecs[n].pack(
+                *(b'c' if p.representation == 'HLAASCIIchar' else k % 100
+                  for p in self.federate.interactions[n].parameters))
+            for k, n in enumerate(indexes))
+
+    def naive(self, data):
+        rows = [[] for _ in self.codecs]
+        offset = 0
+        while offset < len(data):
+            n, = struct.unpack_from('>H', data, offset)
+            codec = self.codecs[n]
+            rows[n].append(codec.unpack_from(data, offset + 2))
+            offset += 2 + codec.size
+        return {codec.name: dict(zip(codec.names, map(list, zip(*r))))
+                for codec, r in zip(self.codecs, rows) if r}
+
+    def test_same(self):
+        expected = self.naive(self.capture)
+        columns = self.module['decode'](self.capture, use_numpy=False)
+        self.assertEqual({i: {p: list(c) for p, c in cs.items()}
+                          for i, cs in columns.items()}, expected)
+        if self.module['numpy'] is not None:
+            columns = self.module['decode'](self.capture, use_numpy=True)
+            self.assertEqual({i: {p: c.tolist() for p, c in cs.items()}
+                              for i, cs in columns.items()}, expected)
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            self.module['decode'](self.capture[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
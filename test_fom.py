@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import tempfile
+import unittest
+
+import fomgen
+from fom import (Attribute, AttributeSlot, Federate, FOM, Interaction, ObjectClass,
+                 Parameter, XmlFom)
+
+
+def xmlfom(spec):
+    with tempfile.TemporaryDirectory() as d:
+        return XmlFom(FOM(*fomgen.write(spec, d)))
+
+
+class XmlFomIndexTester(unittest.TestCase):
+
+    spec = fomgen.FomSpec(modules=2, depth=2, interactions=2, parameters=1,
+                          objects=4, attributes=2, shared=1, datatypes=4)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xml = xmlfom(cls.spec)
+
+    def test_classes(self):
+        classes = self.xml.classes['objectClass']
+        self.assertEqual(set(classes), {
+            ('HLAobjectRoot',),
+            ('HLAobjectRoot', 'Module0Level0'),
+            ('HLAobjectRoot', 'Module0Level0', 'Object0'),
+            ('HLAobjectRoot', 'Module0Level0', 'Object2'),
+            ('HLAobjectRoot', 'Module1Level0'),
+            ('HLAobjectRoot', 'Module1Level0', 'Object1'),
+            ('HLAobjectRoot', 'Module1Level0', 'Object3')})
+        # only what each class declares itself
+        self.assertEqual(classes['HLAobjectRoot', 'Module1Level0'],
+                         {'Module1SharedAttribute0'})
+        self.assertEqual(classes['HLAobjectRoot', 'Module1Level0', 'Object3'],
+                         {'Object3Attribute0', 'Object3Attribute1'})
+
+    def test_basenames(self):
+        basenames = self.xml.basenames['objectClass']
+        self.assertEqual(basenames['Object3'],
+                         ('HLAobjectRoot', 'Module1Level0', 'Object3'))
+        self.assertEqual(self.xml.basenames['interactionClass']['Interaction1'],
+                         ('HLAinteractionRoot', 'Module1Level0', 'Interaction1'))
+
+    def test_datatypes(self):
+        datatype = self.xml.datatypes['Object2Attribute1']
+        self.assertIn(self.xml.representations[datatype], fomgen.REPRESENTATIONS)
+        self.assertIn('Module0SharedAttribute0', self.xml.datatypes)
+
+    def test_has_member(self):
+        path = ('HLAobjectRoot', 'Module0Level0', 'Object2')
+        self.assertTrue(self.xml.has_member('objectClass', path, 'Object2Attribute0'))
+        # inherited from the class above
+        self.assertTrue(self.xml.has_member('objectClass', path, 'Module0SharedAttribute0'))
+        self.assertFalse(self.xml.has_member('objectClass', path, 'Module1SharedAttribute0'))
+        self.assertFalse(self.xml.has_member('objectClass', path, 'Object0Attribute0'))
+        self.assertFalse(self.xml.has_member('objectClass', path[:2], 'Object2Attribute0'))
+
+    def test_merged(self):
+        # every module declares the root class, with its own shared attribute
+        xml = xmlfom(fomgen.FomSpec(modules=3, objects=3, attributes=1, shared=1))
+        self.assertEqual(xml.classes['objectClass'][('HLAobjectRoot',)],
+                         {'Module0SharedAttribute0', 'Module1SharedAttribute0',
+                          'Module2SharedAttribute0'})
+        for m in range(3):
+            self.assertTrue(xml.has_member('objectClass', ('HLAobjectRoot', 'Object2'),
+                                           f'Module{m}SharedAttribute0'))
+
+
+class ObjectClassTester(unittest.TestCase):
+
+    spec = XmlFomIndexTester.spec
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xml = xmlfom(cls.spec)
+
+    def test_basename(self):
+        o = ObjectClass('Object2', 'Module0SharedAttribute0', 'Object2Attribute1')
+        o.resolve(self.xml)
+        self.assertEqual(o.fullname, 'HLAobjectRoot.Module0Level0.Object2')
+        self.assertEqual(o.pathname, 'HLAobjectRoot.Module0Level0')
+        self.assertEqual(o.handle_define, 'ObjectClassHandle object2Handle')
+        self.assertEqual(o.literalname, 'L"HLAobjectRoot.Module0Level0.Object2"')
+
+    def test_fullname(self):
+        for name in ('HLAobjectRoot.Module1Level0.Object1', 'Module1Level0.Object1'):
+            o = ObjectClass(name, 'Object1Attribute0')
+            o.resolve(self.xml)
+            self.assertEqual(o.fullname, 'HLAobjectRoot.Module1Level0.Object1')
+
+    def test_attributes(self):
+        o = ObjectClass('Object0', 'Object0Attribute0', 'Module0SharedAttribute0')
+        o.resolve(self.xml)
+        attribute, shared = o.attributes
+        self.assertIsInstance(attribute, AttributeSlot)
+        self.assertIsInstance(attribute.attribute, Attribute)
+        self.assertEqual(attribute.datatype, self.xml.datatypes['Object0Attribute0'])
+        self.assertEqual(attribute.representation,
+                         self.xml.representations[attribute.datatype])
+        self.assertEqual(attribute.handle_define,
+                         'AttributeHandle object0Object0Attribute0Handle')
+        # resolved attributes are shared between object classes, but each
+        # class has its own handle for them
+        other = ObjectClass('Object2', 'Module0SharedAttribute0')
+        other.resolve(self.xml)
+        self.assertIs(other.attributes[0].attribute, shared.attribute)
+        self.assertIs(self.xml.attribute('Module0SharedAttribute0'), shared.attribute)
+        self.assertNotEqual(other.attributes[0].handlename, shared.handlename)
+
+    def test_errors(self):
+        for o in (ObjectClass('Object9'),
+                  ObjectClass('Module0Level0.Object1'),
+                  # declared by another class
+                  ObjectClass('Object0', 'Object1Attribute0'),
+                  # inherited in another module
+                  ObjectClass('Object0', 'Module1SharedAttribute0'),
+                  ObjectClass('Object0', 'NoSuchAttribute')):
+            with self.assertRaises(LookupError):
+                o.resolve(self.xml)
+
+    def test_federate(self):
+        federate = Federate('Federate', self.xml, *fomgen.interactions(self.spec),
+                            *fomgen.objectclasses(self.spec))
+        self.assertEqual([o.fullname for o in federate.objectclasses],
+                         ['HLAobjectRoot.Module0Level0.Object0',
+                          'HLAobjectRoot.Module1Level0.Object1',
+                          'HLAobjectRoot.Module0Level0.Object2',
+                          'HLAobjectRoot.Module1Level0.Object3'])
+        self.assertEqual([a.name for a in federate.objectclasses[1].attributes],
+                         ['Module1SharedAttribute0', 'Object1Attribute0',
+                          'Object1Attribute1'])
+
+
+class NumberTester(unittest.TestCase):
+
+    spec = fomgen.FomSpec(modules=1, interactions=3, parameters=2, shared=1)
+
+    def test_shared_xml(self):
+        xml = xmlfom(self.spec)
+        first = Federate('First', xml, *fomgen.interactions(self.spec))
+        ids = [(s.name, s.index) for s in first.parameter_slots]
+        enum = first.parameter_enum_define
+        # numbers the same parameters in another order
+        second = Federate('Second', xml, *reversed(fomgen.interactions(self.spec)))
+        self.assertEqual(set(second.unique_parameters), set(first.unique_parameters))
+        self.assertEqual([(s.name, s.index) for s in first.parameter_slots], ids)
+        self.assertEqual(first.parameter_ids,
+                         {p: n for n, p in enumerate(first.unique_parameters)})
+        self.assertNotEqual(second.parameter_ids, first.parameter_ids)
+        self.assertEqual(first.parameter_enum_define, enum)
+
+
+class EnumNameTester(unittest.TestCase):
+
+    def test_unique(self):
+        # the enums are unscoped and share one scope
+        names = [Interaction('HLAinteractionRoot.Speed').enumname,
+                 Interaction('HLAinteractionRoot.Land.Speed').enumname,
+                 Interaction('HLAinteractionRoot.Sea.Speed').enumname,
+                 Parameter('Speed').enumname]
+        self.assertEqual(names, ['speedInteractionId', 'landSpeedInteractionId',
+                                 'seaSpeedInteractionId', 'speedParameterId'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+import fomgen
+from fom import Federate, FOM
+
+
+class FomGenTester(unittest.TestCase):
+
+    spec = fomgen.FomSpec(modules=2, depth=3, interactions=7, parameters=2,
+                          datatypes=4, seed=1)
+
+    def test_deterministic(self):
+        first = [ElementTree.tostring(r) for r in fomgen.generate(self.spec)]
+        second = [ElementTree.tostring(r) for r in fomgen.generate(self.spec)]
+        self.assertEqual(first, second)
+
+    def test_resolves(self):
+        with tempfile.TemporaryDirectory() as d:
+            filenames = fomgen.write(self.spec, d)
+            federate = Federate('Generated', FOM(*filenames),
+                                *fomgen.interactions(self.spec))
+        self.assertEqual(len(federate.interactions), 7)
+        self.assertEqual(len(federate.unique_parameters), 14)
+        self.assertEqual(federate.interactions[1].fullname,
+                         'HLAinteractionRoot.Module1Level0.Module1Level1.Interaction1')
+
+    def test_shared(self):
+        spec = fomgen.FomSpec(modules=2, depth=2, interactions=4, parameters=1,
+                              shared=2)
+        with tempfile.TemporaryDirectory() as d:
+            filenames = fomgen.write(spec, d)
+            federate = Federate('Generated', FOM(*filenames),
+                                *fomgen.interactions(spec))
+        self.assertEqual([p.name for p in federate.interactions[1].parameters],
+                         ['Module1Shared0', 'Module1Shared1', 'Interaction1Parameter0'])
+        self.assertEqual(len(federate.unique_parameters), 2 * 2 + 4)
+        self.assertEqual(len(federate.parameter_slots), 4 * 3)
+
+    def test_objects(self):
+        spec = fomgen.FomSpec(modules=2, depth=3, interactions=2, objects=5,
+                              attributes=2, shared=1)
+        roots = fomgen.generate(spec)
+        # objects are declared before interactions, as the schema orders them
+        self.assertEqual([child.tag for child in roots[0]],
+                         ['modelIdentification', 'objects', 'interactions', 'dataTypes'])
+        with tempfile.TemporaryDirectory() as d:
+            filenames = fomgen.write(spec, d)
+            federate = Federate('Generated', FOM(*filenames),
+                                *fomgen.interactions(spec),
+                                *fomgen.objectclasses(spec))
+        self.assertEqual(len(federate.objectclasses), 5)
+        self.assertEqual(federate.objectclasses[3].fullname,
+                         'HLAobjectRoot.Module1Level0.Module1Level1.Object3')
+        self.assertEqual([a.name for a in federate.objectclasses[3].attributes],
+                         ['Module1SharedAttribute0', 'Object3Attribute0',
+                          'Object3Attribute1'])
+
+    def test_no_objects(self):
+        # specs without objects give the same FOM as before they existed
+        roots = fomgen.generate(self.spec)
+        self.assertEqual([child.tag for child in roots[1]],
+                         ['modelIdentification', 'interactions'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import io
+import itertools
+import json
+import os
+import tempfile
+import unittest
+
+import autocoder
+import fomgen
+import instrument
+from fom import Federate, FOM
+
+
+class ProfileTester(unittest.TestCase):
+
+    def setUp(self):
+        # each call of the clock is one second later
+        self.clock = itertools.count().__next__
+
+    def test_phases(self):
+        timed = []
+        with instrument.Profile(lambda *args: timed.append(args),
+                                clock=self.clock) as profile:
+            with instrument.phase('outer'):
+                with instrument.phase('inner'):
+                    pass
+                with instrument.phase('inner'):
+                    pass
+        self.assertEqual(profile.asdict(), {
+            'total': 7,
+            'phases': {'outer': {'calls': 1, 'time': 5},
+                       'inner': {'calls': 2, 'time': 2}},
+            'counts': {}})
+        self.assertEqual(timed, [('inner', 1), ('inner', 1), ('outer', 5)])
+
+    def test_counts(self):
+        with instrument.Profile() as profile:
+            instrument.count('lines')
+            instrument.count('lines', 2)
+        self.assertEqual(profile.counts, {'lines': 3})
+
+    def test_inactive(self):
+        self.assertIsNone(instrument.active)
+        with instrument.phase('ignored'):
+            instrument.count('ignored')
+        with instrument.Profile() as profile:
+            pass
+        self.assertIsNone(instrument.active)
+        self.assertEqual(profile.times, {})
+
+
+class HookTester(unittest.TestCase):
+
+    spec = fomgen.FomSpec(interactions=4, parameters=2)
+    template = \
+'''{$interactions}
+{interaction.name}
+{interactions$}
+{parameter.name}
+'''
+
+    def test_hooks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = fomgen.write(self.spec, directory)
+            with instrument.Profile() as profile:
+                federate = Federate(FOM(*filenames), *fomgen.interactions(self.spec))
+                result = autocoder.parse(federate, self.template)
+        self.assertEqual(profile.counts['template.lines'], result.count('\n'))
+        self.assertEqual(profile.counts['xml.cache_misses'], 8)
+        for name in ('xml.parse', 'xml.index', 'fom.resolve', 'template.validate',
+                     'template.walk', 'template.format',
+                     'template.find_list_property'):
+            self.assertIn(name, profile.times)
+
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = fomgen.write(self.spec, directory)
+            federate = Federate(FOM(*filenames), *fomgen.interactions(self.spec))
+            out = os.path.join(directory, 'out.txt')
+            for report in ('text', 'json'):
+                file = io.StringIO()
+                profile = autocoder.profile(federate, self.template, out,
+                                            report=report, file=file)
+                self.assertIn('file.write', profile.times)
+                with open(out) as f:
+                    self.assertEqual(profile.counts['template.lines'],
+                                     f.read().count('\n'))
+                if report == 'json':
+                    self.assertEqual(json.loads(file.getvalue()), profile.asdict())
+                else:
+                    self.assertIn('template.walk', file.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 
+import json
+import tracemalloc
 import unittest
 
 import tree
@@ -46,5 +48,339 @@ class BranchesTest(unittest.TestCase):
         self.assertContainsPath(('federate',))
         self.assertContainsPath(('federate', 'interactions'))
 
+
+class ItemsTest(unittest.TestCase):
+
+    def test_items(self):
+        for key, value in tree.items(test_tree):
+            self.assertEqual(value, tree.get(test_tree, key))
+
+    def test_deep(self):
+        deep = subtree = {}
+        for n in range(5000):
+            subtree['a'] = subtree = {}
+        self.assertEqual(len(list(tree.keys(deep))), 5000)
+
+
+class PathKeysTest(unittest.TestCase):
+
+    def assertMatchesAllKeys(self, expanded):
+        self.assertEqual(
+            list(tree.pathkeys(test_tree, expanded)),
+            [k for k in tree.keys(test_tree) if tree.matchkey(expanded, k)])
+
+    def test_paths(self):
+        for path in tree.paths(tree.schema(test_tree)):
+            self.assertMatchesAllKeys(path)
+
+    def test_keys(self):
+        self.assertMatchesAllKeys(('federate', 'interactions', 1, 'name'))
+        self.assertMatchesAllKeys(('federate', 'interactions', 2, 'name'))
+        self.assertMatchesAllKeys(('federate', 'classname', Ellipsis))
+
+    def test_walk(self):
+        self.assertEqual(
+            list(tree.walk(test_tree, ('federate', 'interactions', Ellipsis,
+                                       'parameters', Ellipsis, 'name'))),
+            ['ScenarioName', 'InitialFuelAmount', 'TimeScaleFactor'])
+
+
+class BranchContextTest(unittest.TestCase):
+
+    expanded = ('federate', 'interactions', Ellipsis, 'parameters', Ellipsis)
+
+    def test_flatten(self):
+        self.assertEqual(
+            list(tree.branches(test_tree, self.expanded)),
+            [tree.flatten(test_tree, key)
+             for key in tree.pathkeys(test_tree, self.expanded)])
+
+    def test_view(self):
+        views = list(tree.branches(test_tree, self.expanded, view=True))
+        self.assertEqual(list(map(dict, views)),
+                         list(tree.branches(test_tree, self.expanded)))
+        self.assertIs(views[0].parents.maps[0], views[1].parents.maps[0])
+
+    def test_elements(self):
+        self.assertEqual(
+            [(b['interactions']['name'], b['parameters']['name'])
+             for b in tree.branches(test_tree, self.expanded, elements=True)],
+            [('LoadScenario', 'ScenarioName'),
+             ('LoadScenario', 'InitialFuelAmount'),
+             ('Start', 'TimeScaleFactor')])
+
+
+class SchemaTest(unittest.TestCase):
+
+    ragged = {'a': [{'x': 1}, {'y': [{'z': 2}]}],
+              'b': [[{'p': 1}], [{'q': 2}]]}
+
+    def test_strict(self):
+        self.assertEqual(tree.schema(self.ragged),
+                         {'a': [{'x': {}, 'y': [{'z': {}}]}],
+                          'b': [{'p': {}, 'q': {}}]})
+        self.assertEqual(tree.TreeDict(self.ragged).schema(),
+                         tree.schema(self.ragged))
+
+    def test_sample(self):
+        self.assertEqual(tree.schema(self.ragged, sample=1),
+                         {'a': [{'x': {}}], 'b': [{'p': {}}]})
+        self.assertEqual(tree.schema(test_tree, sample=1),
+                         tree.schema(test_tree))
+
+    def test_deep(self):
+        deep = subtree = {}
+        for n in range(1500):
+            subtree['a'] = [{}]
+            subtree = subtree['a'][0]
+        self.assertEqual(len(list(tree.TreeDict(deep).paths())), 3000)
+
+
+class TreeDictIndexTest(unittest.TestCase):
+
+    t = tree.TreeDict(test_tree)
+
+    def test_membership(self):
+        self.assertTrue(self.t.ispath(('federate', 'interactions')))
+        self.assertTrue(self.t.ispath(
+            ('federate', 'interactions', Ellipsis, 'parameters')))
+        self.assertFalse(self.t.ispath(('federate', 'parameters')))
+        self.assertTrue(self.t.iskey(('federate', 'interactions', 1, 'name')))
+        self.assertFalse(self.t.iskey(('federate', 'interactions', 2)))
+
+    def test_order(self):
+        self.assertEqual(list(self.t.keys()), list(tree.keys(test_tree)))
+        self.assertEqual(list(self.t.paths()),
+                         list(tree.paths(self.t.schema())))
+
+    def test_prefix(self):
+        self.assertEqual(
+            list(self.t.keys(('federate', 'interactions', 1, 'parameters'))),
+            [('federate', 'interactions', 1, 'parameters', 0),
+             ('federate', 'interactions', 1, 'parameters', 0, 'name'),
+             ('federate', 'interactions', 1, 'parameters', 0, 'datatype'),
+             ('federate', 'interactions', 1, 'parameters', 0, 'representation')])
+        self.assertEqual(
+            list(self.t.children(('federate',))),
+            [('federate', 'classname'), ('federate', 'fom'),
+             ('federate', 'interactions')])
+
+
+class TreeDictUpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = tree.TreeDict(test_tree)
+
+    def assertIndexed(self, t):
+        fresh = tree.TreeDict(t.get(()))
+        self.assertEqual(list(t.keys()), list(fresh.keys()))
+        self.assertCountEqual(t.paths(), fresh.paths())
+        self.assertEqual(t.schema(), fresh.schema())
+
+    def test_append(self):
+        self.t.append(('federate', 'interactions'),
+                      {'name': 'Stop', 'parameters': [{'name': 'Reason'}]})
+        self.assertTrue(self.t.iskey(
+            ('federate', 'interactions', 2, 'parameters', 0, 'name')))
+        self.assertIndexed(self.t)
+
+    def test_set(self):
+        self.t.set(('federate', 'interactions', 0, 'parameters'),
+                   [{'name': 'Only', 'extra': {'deep': 1}}])
+        self.t.set(('federate', 'classname'), 'Renamed')
+        self.assertFalse(self.t.iskey(
+            ('federate', 'interactions', 0, 'parameters', 1)))
+        self.assertTrue(self.t.ispath(('federate', 'interactions', Ellipsis,
+                                       'parameters', Ellipsis, 'extra', 'deep')))
+        self.assertEqual(list(self.t.accessor('federate.classname')()),
+                         ['Renamed'])
+        self.assertIndexed(self.t)
+
+    def test_snapshot(self):
+        snapshot = self.t.snapshot()
+        self.t.append(('federate', 'fom'), 'Other.xml')
+        self.t.set(('federate', 'meta', 'version'), 3)
+        self.assertEqual(list(snapshot.keys()), list(tree.keys(test_tree)))
+        self.assertEqual(snapshot.schema(), tree.schema(test_tree))
+        self.assertIs(snapshot.get(()), test_tree)
+        self.assertEqual(test_tree['federate']['fom'], ["FuelEconomyBase.xml"])
+        self.assertIndexed(self.t)
+
+    def test_shrink(self):
+        proxy = tree.Tree(test_tree)
+        t = proxy.__tree__
+        self.assertEqual(len(list(proxy.federate.interactions.parameters)), 3)
+        t.set(('federate', 'interactions'), [{'name': 'Only'}])
+        self.assertFalse(t.ispath(('federate', 'interactions', Ellipsis, 'parameters')))
+        self.assertIndexed(t)
+        with self.assertRaises(AttributeError):
+            proxy.federate.interactions.parameters
+        # a path stays while any key is still on it
+        self.t.set(('federate', 'interactions', 0, 'parameters'), [])
+        self.assertTrue(self.t.ispath(('federate', 'interactions', Ellipsis,
+                                       'parameters', Ellipsis, 'name')))
+        self.t.set(('federate', 'interactions', 1, 'parameters'), [])
+        self.assertFalse(self.t.ispath(('federate', 'interactions', Ellipsis,
+                                        'parameters', Ellipsis, 'name')))
+        self.assertIndexed(self.t)
+
+    def test_sampled(self):
+        t = tree.TreeDict(test_tree, sample=1)
+        t.set(('federate', 'fom'), 'One.xml')
+        self.assertIndexed(t)
+
+    def test_columnar(self):
+        with self.assertRaises(TypeError):
+            tree.ColumnarTreeDict(test_tree).set(('federate', 'classname'), 'X')
+
+
+class QueryTest(unittest.TestCase):
+
+    t = tree.TreeDict(test_tree)
+
+    def test_parse(self):
+        self.assertEqual(tree.parsequery('federate.**.parameters[*].name'),
+                         ('federate', tree.DEEP, 'parameters', Ellipsis, 'name'))
+        self.assertEqual(tree.parsequery('fom[0].*[...]'),
+                         ('fom', 0, tree.ANY, Ellipsis))
+        with self.assertRaises(ValueError):
+            tree.parsequery('federate..name')
+
+    def test_plan(self):
+        params = ('federate', 'interactions', Ellipsis, 'parameters', Ellipsis)
+        self.assertEqual(self.t.query('federate.**.parameters[*].name').paths,
+                         (params + ('name',),))
+        self.assertEqual(self.t.query('**.name').paths,
+                         tuple(tree.find(self.t.schema(), 'name')))
+        self.assertEqual(self.t.query('federate.interactions.name').paths,
+                         (self.t.canonicalise(('federate', 'interactions', 'name')),))
+        self.assertEqual(self.t.query('federate.interactions[1].parameters.*').paths,
+                         (('federate', 'interactions', 1, 'parameters', Ellipsis, 'name'),
+                          ('federate', 'interactions', 1, 'parameters', Ellipsis, 'datatype'),
+                          ('federate', 'interactions', 1, 'parameters', Ellipsis, 'representation')))
+        self.assertEqual(self.t.query('**.classname[*]').paths, ())
+
+    def test_run(self):
+        query = self.t.query('**.parameters.name')
+        self.assertEqual(list(query(test_tree)),
+                         ['ScenarioName', 'InitialFuelAmount', 'TimeScaleFactor'])
+        self.assertEqual(list(query.keys(test_tree))[-1],
+                         ('federate', 'interactions', 1, 'parameters', 0, 'name'))
+
+    def test_cache(self):
+        t = tree.TreeDict(test_tree)
+        query = t.query('**.name')
+        self.assertIs(t.query('**.name'), query)
+        t.set(('federate', 'name'), 'Renamed')
+        self.assertIsNot(t.query('**.name'), query)
+        self.assertIn(('federate', 'name'), t.query('**.name').paths)
+
+
+class ColumnarTreeDictTest(unittest.TestCase):
+
+    t = tree.TreeDict(test_tree)
+    c = tree.ColumnarTreeDict(test_tree)
+
+    def test_api(self):
+        self.assertEqual(list(self.c.keys()), list(self.t.keys()))
+        self.assertEqual(list(self.c.values()), list(self.t.values()))
+        self.assertEqual(list(self.c.items()), list(self.t.items()))
+
+    def test_walk(self):
+        for path in self.t.paths():
+            self.assertEqual(list(self.c.walk(path)), list(self.t.walk(path)))
+        key = ('federate', 'interactions', 1, 'name')
+        self.assertEqual(list(self.c.walk(key)), ['Start'])
+
+    def test_keys(self):
+        for key in self.t.keys():
+            self.assertTrue(self.c.iskey(key))
+            self.assertEqual(list(self.c.keys(key)), list(self.t.keys(key)))
+            self.assertEqual(list(self.c.children(key)),
+                             list(self.t.children(key)))
+        self.assertFalse(self.c.iskey(('federate', 'interactions', 2)))
+
+    def test_missing(self):
+        # the same answers as TreeDict for keys that are not in the tree
+        for key in [('federate', 'interactions', Ellipsis),
+                    ('federate', 'interactions', 2),
+                    ('federate', 'interactions', -1),
+                    ('federate', 'widgets'),
+                    ('federate', 'classname', 'name')]:
+            self.assertEqual(self.c.iskey(key), self.t.iskey(key))
+            self.assertFalse(self.c.iskey(key))
+            self.assertEqual(list(self.c.children(key)), list(self.t.children(key)))
+            self.assertEqual(list(self.c.keys(key)), list(self.t.keys(key)))
+
+    def test_get(self):
+        self.assertEqual(self.c.get(()), test_tree)
+        for key in self.t.keys():
+            self.assertEqual(self.c.get(key), self.t.get(key))
+        self.assertEqual(str(self.c), str(self.t))
+        self.assertEqual(self.c.node(('federate', 'classname')), 'Federate')
+        self.assertIsInstance(self.c.node(('federate', 'fom')), tree.Node)
+        path = ('federate', 'interactions', Ellipsis, 'parameters', Ellipsis, 'name')
+        self.assertEqual(list(self.c.branches(path, keys=True)),
+                         list(self.t.branches(path, keys=True)))
+
+    def test_columns(self):
+        d = {'interactions': [{'name': f'Interaction{n}', 'index': n,
+                               'rate': n / 2, 'fom': 'Base.xml'}
+                              for n in range(1000)]}
+        c = tree.ColumnarTreeDict(d)
+        # a copy: later changes to the dicts are not seen
+        d['interactions'][0]['name'] = 'Renamed'
+        self.assertEqual(list(c.walk(('interactions', Ellipsis, 'name')))[0],
+                         'Interaction0')
+        self.assertEqual(list(c.walk(('interactions', Ellipsis, 'index'))),
+                         list(range(1000)))
+        self.assertEqual(c.get(('interactions', 3, 'rate')), 1.5)
+        self.assertEqual(c.get(('interactions', 3)),
+                         {'name': 'Interaction3', 'index': 3, 'rate': 1.5,
+                          'fom': 'Base.xml'})
+        # each string is held once, however often it repeats
+        self.assertEqual(len({id(v) for v in c.walk(('interactions', Ellipsis, 'fom'))}), 1)
+
+    def test_compact(self):
+        text = json.dumps({'interactions': [
+            {'name': f'Interaction{n}', 'parameters': [
+                {'name': f'Parameter{p}', 'datatype': 'HLAinteger32BE', 'size': 4}
+                for p in range(10)]}
+            for n in range(300)]})
+        tracemalloc.start()
+        try:
+            d = json.loads(text)
+            loaded = tracemalloc.get_traced_memory()[0]
+            c = tree.ColumnarTreeDict(d)
+            del d
+            indexed = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(indexed, loaded / 2)
+        self.assertEqual(c.get(('interactions', 299, 'parameters', 9, 'size')), 4)
+
+
+class TreeProxyTest(unittest.TestCase):
+
+    t = tree.Tree(test_tree)
+
+    def test_cached(self):
+        self.assertIs(self.t.federate.interactions,
+                      self.t.federate.interactions)
+        self.assertIs(self.t.federate.interactions,
+                      tree.Tree.__getter__(self.t.__tree__, ('federate',)).interactions)
+
+    def test_through_lists(self):
+        self.assertEqual(
+            list(self.t.federate.interactions.parameters.name),
+            ['ScenarioName', 'InitialFuelAmount', 'TimeScaleFactor'])
+
+    def test_accessor(self):
+        accessor = self.t.__tree__.accessor('federate.interactions.name')
+        self.assertIs(accessor,
+                      self.t.__tree__.accessor('federate.interactions.name'))
+        self.assertEqual(list(accessor()), ['LoadScenario', 'Start'])
+
+
 if __name__ == '__main__':
     unittest.main()
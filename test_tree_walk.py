@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import copy
+import unittest
+
+from tree import Tree
+from autocoder import walk, parse, namespace, TemplateError
+from test_tree import test_tree
+
+
+class TreeWalkTester(unittest.TestCase):
+
+    model = Tree(test_tree)
+
+    def test(self):
+        result = walk(self.model, self.input)
+        self.assertEqual(result, self.output)
+
+
+class TreeParseTester(unittest.TestCase):
+
+    model = Tree(test_tree)
+
+    def test(self):
+        result = parse(self.model, self.input)
+        self.assertEqual(result, self.output)
+
+
+class TreeFederateTestCase(TreeWalkTester):
+    input = ['{federate.classname}']
+    output = ['Federate']
+
+
+class TreeInteractionTestCase(TreeWalkTester):
+    input = ['{interaction.name}']
+    output = ['LoadScenario', 'Start']
+
+
+class TreeParameterTestCase(TreeWalkTester):
+    input = ['{parameter.representation} {parameter.name}; // {interaction.name}']
+    output = ['HLAUnicodeString ScenarioName; // LoadScenario',
+              'HLAinteger32BE InitialFuelAmount; // LoadScenario',
+              'HLAfloat32BE TimeScaleFactor; // Start']
+
+
+class TreeLoopTestCase(TreeParseTester):
+    input = \
+'''
+  switch (theInteraction) {
+  {$interactions}
+  case {interaction.name}:
+    {$parameters}
+    {parameter.name}Param(theParameterValues.find({parameter.name}Handle));
+    {parameters$}
+  break;
+  {interactions$}
+  }
+'''
+
+    output = \
+'''
+  switch (theInteraction) {
+  case LoadScenario:
+    ScenarioNameParam(theParameterValues.find(ScenarioNameHandle));
+    InitialFuelAmountParam(theParameterValues.find(InitialFuelAmountHandle));
+  break;
+  case Start:
+    TimeScaleFactorParam(theParameterValues.find(TimeScaleFactorHandle));
+  break;
+  }
+'''
+
+
+class TreeValidateTestCase(unittest.TestCase):
+
+    def test(self):
+        with self.assertRaises(TemplateError) as cm:
+            parse(Tree(test_tree), '{parameter.nme}\n{widget.name}\n')
+        self.assertEqual([n for n, _ in cm.exception.errors], [1, 2])
+
+
+class TreeNoFederateTestCase(unittest.TestCase):
+
+    def test(self):
+        model = Tree({'widgets': [{'name': 'a'}]})
+        with self.assertRaises(TemplateError) as cm:
+            parse(model, '{$interactions}\n{interaction.name}\n{interactions$}\n')
+        self.assertEqual(cm.exception.errors,
+                         [(1, '{$interactions}: the model has no federate')])
+
+
+class TreeNodeTestCase(unittest.TestCase):
+
+    def test_shared(self):
+        model = Tree(test_tree)
+        first, _ = namespace(model)
+        second, _ = namespace(model)
+        self.assertIs(first['federate'], second['federate'])
+        self.assertIs(first['federate'].interactions[0],
+                      second['federate'].interactions[0])
+
+    def test_update(self):
+        model = Tree(copy.deepcopy(test_tree))
+        template = '{$interactions}\n{interaction.name}\n{interactions$}\n'
+        self.assertEqual(parse(model, template), 'LoadScenario\nStart\n')
+        model.__tree__.set(('federate', 'interactions', 1, 'name'), 'Stop')
+        self.assertEqual(parse(model, template), 'LoadScenario\nStop\n')
+
+
+class TreeNamesTestCase(unittest.TestCase):
+
+    model = Tree({'federate': {'phases': [{'name': 'Load'}, {'name': 'Run'}],
+                               'stages': [{'parameters': [{'name': 'a'}]}],
+                               'parameters': [{'name': 'b'}]}})
+
+    def test_singular(self):
+        self.assertEqual(parse(self.model, '{phase.name}\n'), 'Load\nRun\n')
+        self.assertEqual(parse(self.model, '{$phases}\n{phase.name}\n{phases$}\n'),
+                         'Load\nRun\n')
+
+    def test_ambiguous(self):
+        with self.assertRaises(LookupError):
+            walk(self.model, ['{parameter.name}\n'])
+        with self.assertRaises(TemplateError) as cm:
+            parse(self.model, '{parameter.name}\n')
+        self.assertIn('ambiguous', cm.exception.errors[0][1])
+
+
+# Remove base classes from module namespace
+# so they aren't seen by the test runner
+del(TreeWalkTester)
+del(TreeParseTester)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,28 @@
 #!/usr/bin/env python3
 
+import importlib
+import inspect
+import os
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
+import fomgen
 from fom import Federate, FOM, Interaction
-from autocoder import walk, parse
-# from hla_autocoder import walk, parse
+
+# AUTOCODER_ENGINE=hla_autocoder runs the tests against the legacy engine,
+# skipping the cases for what only autocoder does
+engine = importlib.import_module(os.environ.get('AUTOCODER_ENGINE', 'autocoder'))
+walk, parse = engine.walk, engine.parse
+
+needs_executor = unittest.skipUnless(
+    'executor' in inspect.signature(walk).parameters,
+    f'{engine.__name__} renders serially')
+needs_pool = unittest.skipUnless(hasattr(engine, 'Pool'),
+                                 f'{engine.__name__} has no Pool')
+# {$name} blocks over any list of the federate, e.g. {$signatures}
+needs_blocks = unittest.skipUnless(hasattr(engine, 'block_re'),
+                                   f'{engine.__name__} has no {{$name}} blocks')
 
 
 class WalkTester(unittest.TestCase):
@@ -305,6 +323,37 @@ class InteractionAndParamaterLoopTestCase(ParseTester):
 '''
 
 
+@needs_executor
+class ParallelInteractionLoopTestCase(InteractionAndParamaterLoopTestCase):
+
+    def test(self):
+        with ThreadPoolExecutor(2) as executor:
+            result = parse(self.federate, self.input,
+                           executor=executor, threshold=1, chunksize=1)
+        self.assertEqual(result, self.output)
+
+
+@needs_pool
+class PoolInteractionLoopTestCase(InteractionAndParamaterLoopTestCase):
+
+    def test(self):
+        with engine.Pool(self.federate, 2) as pool:
+            result = parse(self.federate, self.input,
+                           executor=pool, threshold=1, chunksize=1)
+        self.assertEqual(result, self.output)
+
+    def test_other_federate(self):
+        # rendered serially, as the workers hold a different federate
+        other = Federate(
+            "Federate", FOM("FuelEconomyBase.xml"),
+            Interaction("LoadScenario", "ScenarioName", "InitialFuelAmount"),
+            Interaction("Start", "TimeScaleFactor"))
+        with engine.Pool(other, 2) as pool:
+            result = parse(self.federate, self.input,
+                           executor=pool, threshold=1, chunksize=1)
+        self.assertEqual(result, self.output)
+
+
 class LookMaNoDoubleBracketsTestCase(ParseTester):
     input = \
 '''
@@ -336,6 +385,271 @@ class LookMaNoDoubleBracketsTestCase(ParseTester):
 '''
 
 
+class DispatchTableTestCase(ParseTester):
+    input = \
+'''
+  {federate.handle_hash_define};
+  {federate.interaction_enum_define};
+  {federate.parameter_enum_define};
+  {federate.dispatch_define};
+  {federate.parameter_dispatch_define};
+
+  {$interactions}
+  {federate.dispatchname}[{interaction.handlename}] = {interaction.enumname};
+  {$parameters}
+  {federate.parameter_dispatchname}[{interaction.enumname}][{parameter.handlename}] = {parameter.enumname};
+  {parameters$}
+  {interactions$}
+
+  switch ({federate.dispatchname}.at(theInteraction))
+  {
+  {$interactions}
+  case {interaction.enumname}: {interaction.dispatchname}(theParameterValues); break;
+  {interactions$}
+  }
+'''
+
+    output = \
+'''
+  struct HandleHash { template <class Handle> size_t operator()(const Handle& handle) const { return static_cast<size_t>(handle.hash()); } };
+  enum InteractionId { loadScenarioInteractionId, startInteractionId, InteractionCount };
+  enum ParameterId { scenarioNameParameterId, initialFuelAmountParameterId, timeScaleFactorParameterId, ParameterCount };
+  std::unordered_map<InteractionClassHandle, InteractionId, HandleHash> interactionDispatch;
+  std::unordered_map<ParameterHandle, ParameterId, HandleHash> parameterDispatch[InteractionCount];
+
+  interactionDispatch[loadScenarioHandle] = loadScenarioInteractionId;
+  parameterDispatch[loadScenarioInteractionId][scenarioNameHandle] = scenarioNameParameterId;
+  parameterDispatch[loadScenarioInteractionId][initialFuelAmountHandle] = initialFuelAmountParameterId;
+  interactionDispatch[startHandle] = startInteractionId;
+  parameterDispatch[startInteractionId][timeScaleFactorHandle] = timeScaleFactorParameterId;
+
+  switch (interactionDispatch.at(theInteraction))
+  {
+  case loadScenarioInteractionId: loadScenarioDispatch(theParameterValues); break;
+  case startInteractionId: startDispatch(theParameterValues); break;
+  }
+'''
+
+
+class PreallocatedSendTestCase(ParseTester):
+    input = \
+'''
+  {$interactions}
+  {interaction.parametermap_define}; // {interaction.parameter_count} parameters, {interaction.capacity} bytes
+  {$parameters}
+  {parameter.encoder_define};
+  {parameter.buffer_define} = std::vector<Octet>({parameter.capacity});
+  {parameters$}
+  {interactions$}
+
+  {$interactions}
+  void {federate.classname}::send{interaction.name}({interaction.callback_arguments_define})
+  {
+    {$parameters}
+    {parameter.encodername}.set({parameter.varname});
+    {parameter.buffername}.clear();
+    {parameter.encodername}.encodeInto({parameter.buffername});
+    {interaction.parametermapname}[{parameter.handlename}].setDataPointer({parameter.buffername}.data(), {parameter.buffername}.size());
+    {parameters$}
+  }
+  {interactions$}
+'''
+
+    output = \
+'''
+  ParameterHandleValueMap loadScenarioParameters; // 2 parameters, 68 bytes
+  HLAunicodeString scenarioNameEncoder;
+  std::vector<Octet> scenarioNameBuffer = std::vector<Octet>(64);
+  HLAinteger32BE initialFuelAmountEncoder;
+  std::vector<Octet> initialFuelAmountBuffer = std::vector<Octet>(4);
+  ParameterHandleValueMap startParameters; // 1 parameters, 4 bytes
+  HLAfloat32BE timeScaleFactorEncoder;
+  std::vector<Octet> timeScaleFactorBuffer = std::vector<Octet>(4);
+
+  void Federate::sendLoadScenario(std::wstring scenarioName, Integer32 initialFuelAmount)
+  {
+    scenarioNameEncoder.set(scenarioName);
+    scenarioNameBuffer.clear();
+    scenarioNameEncoder.encodeInto(scenarioNameBuffer);
+    loadScenarioParameters[scenarioNameHandle].setDataPointer(scenarioNameBuffer.data(), scenarioNameBuffer.size());
+    initialFuelAmountEncoder.set(initialFuelAmount);
+    initialFuelAmountBuffer.clear();
+    initialFuelAmountEncoder.encodeInto(initialFuelAmountBuffer);
+    loadScenarioParameters[initialFuelAmountHandle].setDataPointer(initialFuelAmountBuffer.data(), initialFuelAmountBuffer.size());
+  }
+  void Federate::sendStart(float timeScaleFactor)
+  {
+    timeScaleFactorEncoder.set(timeScaleFactor);
+    timeScaleFactorBuffer.clear();
+    timeScaleFactorEncoder.encodeInto(timeScaleFactorBuffer);
+    startParameters[timeScaleFactorHandle].setDataPointer(timeScaleFactorBuffer.data(), timeScaleFactorBuffer.size());
+  }
+'''
+
+    def test_sizes(self):
+        load, start = self.federate.interactions
+        self.assertIsNone(load.encoded_size)
+        self.assertEqual(start.encoded_size, 4)
+        self.assertEqual(start.parameter_count, 1)
+
+
+class BatchedHandleTestCase(ParseTester):
+    input = \
+'''
+  {federate.interaction_enum_define};
+  {federate.parameter_slot_enum_define};
+  {federate.interaction_names_define};
+  {federate.parameter_names_define};
+  {federate.parameter_owners_define};
+  {federate.interaction_handles_define};
+  {federate.parameter_handles_define};
+
+  for (int i = 0; i < InteractionCount; ++i)
+    {federate.interaction_handlesname}[i] = rtiAmbassador->getInteractionClassHandle({federate.interaction_namesname}[i]);
+  for (int p = 0; p < ParameterSlotCount; ++p)
+    {federate.parameter_handlesname}[p] = rtiAmbassador->getParameterHandle({federate.interaction_handlesname}[{federate.parameter_ownersname}[p]], {federate.parameter_namesname}[p]);
+
+  {$interactions}
+  rtiAmbassador->subscribeInteractionClass({interaction.handleref});
+  {$parameters}
+  {parameter.decodername}.decode(theParameterValues.at({parameter.handleref}));
+  {parameters$}
+  {interactions$}
+'''
+
+    output = \
+'''
+  enum InteractionId { loadScenarioInteractionId, startInteractionId, InteractionCount };
+  enum ParameterSlotId { loadScenarioScenarioNameSlot, loadScenarioInitialFuelAmountSlot, startTimeScaleFactorSlot, ParameterSlotCount };
+  static constexpr const wchar_t* interactionNames[InteractionCount] = { L"HLAinteractionRoot.LoadScenario", L"HLAinteractionRoot.Start" };
+  static constexpr const wchar_t* parameterNames[ParameterSlotCount] = { L"ScenarioName", L"InitialFuelAmount", L"TimeScaleFactor" };
+  static constexpr InteractionId parameterInteractions[ParameterSlotCount] = { loadScenarioInteractionId, loadScenarioInteractionId, startInteractionId };
+  InteractionClassHandle interactionHandles[InteractionCount];
+  ParameterHandle parameterHandles[ParameterSlotCount];
+
+  for (int i = 0; i < InteractionCount; ++i)
+    interactionHandles[i] = rtiAmbassador->getInteractionClassHandle(interactionNames[i]);
+  for (int p = 0; p < ParameterSlotCount; ++p)
+    parameterHandles[p] = rtiAmbassador->getParameterHandle(interactionHandles[parameterInteractions[p]], parameterNames[p]);
+
+  rtiAmbassador->subscribeInteractionClass(interactionHandles[loadScenarioInteractionId]);
+  scenarioNameDecoder.decode(theParameterValues.at(parameterHandles[loadScenarioScenarioNameSlot]));
+  initialFuelAmountDecoder.decode(theParameterValues.at(parameterHandles[loadScenarioInitialFuelAmountSlot]));
+  rtiAmbassador->subscribeInteractionClass(interactionHandles[startInteractionId]);
+  timeScaleFactorDecoder.decode(theParameterValues.at(parameterHandles[startTimeScaleFactorSlot]));
+'''
+
+    def test_shared(self):
+        # an inherited parameter has a handle slot in each interaction
+        spec = fomgen.FomSpec(interactions=2, parameters=0, shared=1)
+        with tempfile.TemporaryDirectory() as d:
+            federate = Federate('Federate', FOM(*fomgen.write(spec, d)),
+                                *fomgen.interactions(spec))
+        first, second = (i.parameters[0] for i in federate.interactions)
+        self.assertIs(first.parameter, second.parameter)
+        self.assertEqual(len(federate.unique_parameters), 1)
+        self.assertEqual(
+            parse(federate, '{$interactions}\n{$parameters}\n'
+                            '{parameter.handleref} {parameter.name}\n'
+                            '{parameters$}\n{interactions$}\n'),
+            'parameterHandles[interaction0Module0Shared0Slot] Module0Shared0\n'
+            'parameterHandles[interaction1Module0Shared0Slot] Module0Shared0\n')
+        self.assertIn('{ interaction0InteractionId, interaction1InteractionId }',
+                      federate.parameter_owners_define)
+
+
+@needs_blocks
+class ObjectClassTestCase(ParseTester):
+    spec = fomgen.FomSpec(interactions=1, parameters=1, objects=2, attributes=1,
+                          shared=1, datatypes=1)
+    with tempfile.TemporaryDirectory() as d:
+        federate = Federate('Federate', FOM(*fomgen.write(spec, d)),
+                            *fomgen.interactions(spec), *fomgen.objectclasses(spec))
+    del d
+
+    input = \
+'''
+  {objectclass.handle_define};
+  {attribute.handle_define};
+  {$objectclasses}
+  {objectclass.handlename} = rtiAmbassador->getObjectClassHandle({objectclass.literalname});
+  virtual void reflect{objectclass.name}({objectclass.callback_arguments_define});
+  {objectclasses$}
+'''
+
+    output = \
+'''
+  ObjectClassHandle object0Handle;
+  ObjectClassHandle object1Handle;
+  AttributeHandle object0Module0SharedAttribute0Handle;
+  AttributeHandle object0Object0Attribute0Handle;
+  AttributeHandle object1Module0SharedAttribute0Handle;
+  AttributeHandle object1Object1Attribute0Handle;
+  object0Handle = rtiAmbassador->getObjectClassHandle(L"HLAobjectRoot.Object0");
+  virtual void reflectObject0(Integer64 module0SharedAttribute0, Integer64 object0Attribute0);
+  object1Handle = rtiAmbassador->getObjectClassHandle(L"HLAobjectRoot.Object1");
+  virtual void reflectObject1(Integer64 module0SharedAttribute0, Integer64 object1Attribute0);
+'''
+
+
+@needs_blocks
+class SignatureTestCase(ParseTester):
+    input = \
+'''
+  {$representations}
+  {representation.decoder_define};
+  {representations$}
+
+  {$signatures}
+  {signature.decoder_define}
+  {
+    {$parameters}
+    auto {parameter.varname}Param = theParameterValues.find({parameter.handlename});
+    if ({parameter.varname}Param == theParameterValues.end()) return false;
+    {parameter.shared_decodername}.decode({parameter.varname}Param->second);
+    {parameter.varname} = {parameter.shared_decodername}.get();
+    {parameters$}
+    return true;
+  }
+  {signatures$}
+
+  {$interactions}
+  case {interaction.enumname}: {interaction.signature.decodername}(theParameterValues, {interaction.handle_arguments}, {interaction.callback_arguments}); break;
+  {interactions$}
+'''
+
+    output = \
+'''
+  HLAunicodeString HLAunicodeStringDecoder;
+  HLAinteger32BE HLAinteger32BEDecoder;
+  HLAfloat32BE HLAfloat32BEDecoder;
+
+  bool decode_HLAunicodeString_HLAinteger32BE(const ParameterHandleValueMap& theParameterValues, ParameterHandle v0Handle, ParameterHandle v1Handle, std::wstring& v0, Integer32& v1)
+  {
+    auto v0Param = theParameterValues.find(v0Handle);
+    if (v0Param == theParameterValues.end()) return false;
+    HLAunicodeStringDecoder.decode(v0Param->second);
+    v0 = HLAunicodeStringDecoder.get();
+    auto v1Param = theParameterValues.find(v1Handle);
+    if (v1Param == theParameterValues.end()) return false;
+    HLAinteger32BEDecoder.decode(v1Param->second);
+    v1 = HLAinteger32BEDecoder.get();
+    return true;
+  }
+  bool decode_HLAfloat32BE(const ParameterHandleValueMap& theParameterValues, ParameterHandle v0Handle, float& v0)
+  {
+    auto v0Param = theParameterValues.find(v0Handle);
+    if (v0Param == theParameterValues.end()) return false;
+    HLAfloat32BEDecoder.decode(v0Param->second);
+    v0 = HLAfloat32BEDecoder.get();
+    return true;
+  }
+
+  case loadScenarioInteractionId: decode_HLAunicodeString_HLAinteger32BE(theParameterValues, scenarioNameHandle, initialFuelAmountHandle, scenarioName, initialFuelAmount); break;
+  case startInteractionId: decode_HLAfloat32BE(theParameterValues, timeScaleFactorHandle, timeScaleFactor); break;
+'''
+
+
 class NoDuplicating(WalkTester):
     input = ['ParameterValueMap parameterMap']
     output = ['ParameterValueMap parameterMap']
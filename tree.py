@@ -2,8 +2,14 @@
 tree.py
 '''
 
+import array
+import bisect
+import builtins
 import collections
+import copy
+import functools
 import itertools
+import re
 
 
 def get(tree, key):
@@ -23,72 +29,127 @@ def set(tree, key, value):
     subtree[base] = value
 
 
-def schema(tree, _schema=None):
+def copypath(tree, key):
+    '''a shallow copy of tree, with the containers along key copied too
+
+    missing names along key are created as empty dicts, as by set. returns
+    the new root and the copied container at key'''
+    root = subtree = copy.copy(tree)
+    for name in key:
+        if isinstance(subtree, dict) and name not in subtree:
+            child = {}
+        else:
+            child = copy.copy(subtree[name])
+        subtree[name] = child
+        subtree = child
+    return root, subtree
+
+
+def keypath(key):
+    '''the schema path of key, with Ellipsis for list positions'''
+    path = []
+    for name in key:
+        if not isinstance(name, int):
+            path.append(name)
+        elif not (path and path[-1] is Ellipsis):
+            # elements of nested lists share the same schema
+            path.append(Ellipsis)
+    return tuple(path)
+
+
+def schema(tree, _schema=None, *, sample=None):
+    '''the names found in tree, with each list holding one merged element schema
+
+    every element of every list is merged unless sample is given, in
+    which case only the first sample elements of each list are read'''
     if _schema is None:
         _schema = {}
-    if isinstance(tree, dict):
-        for k, v in tree.items():
-            if isinstance(v, list):
-                _schema[k] = [{}]
-                schema(v, _schema[k][0])
-            else:
-                _schema[k] = {}
-                schema(v, _schema[k])
-
-    elif isinstance(tree, list):
-        for v in tree:
-            schema(v, _schema)
-    else:
+    if not isinstance(tree, (dict, list)):
         return
+    for _ in schemaitems(tree, _schema, sample=sample):
+        pass
     return _schema
 
 
-def keys(tree, _parent=None):
-    if isinstance(tree, dict):
-        for k, v in tree.items():
-            if _parent:
-                p = _parent + (k,)
-            else:
-                p = (k,)
-            yield p
-            yield from keys(v, p)
-    elif isinstance(tree, list):
-        for n, v in enumerate(tree):
-            if _parent:
-                p = _parent + (n,)
+def schemaitems(tree, _schema, *, sample=None):
+    '''items(tree), merging the schema of everything visited into _schema'''
+    stack = [(_schema, children((), tree, sample))]
+    while stack:
+        s, subtrees = stack[-1]
+        for key, value in subtrees:
+            yield key, value
+            name = key[-1]
+            if isinstance(name, int):
+                # elements of nested lists share the same schema
+                child = s
+            elif isinstance(value, list):
+                node = s.get(name)
+                if not isinstance(node, list):
+                    node = s[name] = [{}]
+                child = node[0]
             else:
-                p = (n,)
-            yield p
-            yield from keys(v, p)
+                child = s.get(name)
+                if not isinstance(child, dict):
+                    child = s[name] = {}
+            stack.append((child, children(key, value, sample)))
+            break
+        else:
+            stack.pop()
 
 
-def values(tree):
-    for key in keys(tree):
-        yield get(tree, key)
+def children(key, tree, sample=None):
+    '''the (key, subtree) pairs directly below tree, which is found at key
+
+    if sample is given, only the first sample elements of a list'''
+    if isinstance(tree, dict):
+        return ((key + (k,), v) for k, v in tree.items())
+    elif isinstance(tree, list):
+        if sample is not None:
+            tree = itertools.islice(tree, sample)
+        return ((key + (n,), v) for n, v in enumerate(tree))
+    return iter(())
 
 
 def items(tree):
-    for key in keys(tree):
-        yield key, get(tree, key)
+    '''every (key, subtree) pair in tree, depth first, in a single pass'''
+    stack = [children((), tree)]
+    while stack:
+        for key, value in stack[-1]:
+            yield key, value
+            stack.append(children(key, value))
+            break
+        else:
+            stack.pop()
+
+
+def keys(tree):
+    for key, _ in items(tree):
+        yield key
+
+
+def values(tree):
+    for _, value in items(tree):
+        yield value
 
 
-def paths(schema, _parent=None):
+def schemachildren(path, schema):
     if isinstance(schema, dict):
-        for k, v in schema.items():
-            if _parent:
-                p = _parent + (k,)
-            else:
-                p = (k,)
-            yield p
-            yield from paths(v, p)
+        return ((path + (k,), v) for k, v in schema.items())
     elif isinstance(schema, list):
-        for v in schema:
-            if _parent:
-                p = _parent + (Ellipsis,)
-            else:
-                p = (Ellipsis,)
-            yield p
-            yield from paths(v, p)
+        return ((path + (Ellipsis,), v) for v in schema)
+    return iter(())
+
+
+def paths(schema):
+    '''every path in schema, depth first, with Ellipsis for list elements'''
+    stack = [schemachildren((), schema)]
+    while stack:
+        for path, subschema in stack[-1]:
+            yield path
+            stack.append(schemachildren(path, subschema))
+            break
+        else:
+            stack.pop()
 
 
 def search(tree, name):
@@ -132,17 +193,44 @@ def matchkey(expanded, key):
     return True
 
 
+def step(level, name):
+    '''the (key, subtree) pairs one name below each pair in level'''
+    for key, subtree in level:
+        if name is Ellipsis:
+            for k, v in children(key, subtree):
+                if isinstance(k[-1], int):
+                    yield k, v
+        elif isinstance(subtree, dict):
+            if name in subtree:
+                yield key + (name,), subtree[name]
+        elif isinstance(subtree, list) and isinstance(name, int):
+            if -1 < name < len(subtree):
+                yield key + (name,), subtree[name]
+
+
+def pathitems(tree, expanded):
+    '''the (key, subtree) pairs whose keys match expanded
+
+    the path is followed directly from the root, fanning out only at
+    Ellipsis, so the cost is proportional to the number of matches'''
+    if not expanded:
+        return iter(())
+    level = iter([((), tree)])
+    for name in expanded:
+        level = step(level, name)
+    return level
+
+
 def pathkeys(tree, expanded):
 
-    for key in keys(tree):
-        if matchkey(expanded, key):
-            yield key
+    for key, _ in pathitems(tree, expanded):
+        yield key
 
 
 def walk(tree, expanded):
 
-    for key in pathkeys(tree, expanded):
-        yield get(tree, key)
+    for _, value in pathitems(tree, expanded):
+        yield value
 
 def flatten(tree, key):
     result = {}
@@ -155,63 +243,649 @@ def flatten(tree, key):
     return result
 
 
-def branches(tree, expanded):
+def extend(context, name, value, view):
+    if view:
+        return context.new_child({name: value})
+    return {**context, name: value}
+
+
+def branchstep(level, name, view, elements, keys):
+    '''like step, extending each context with the named subtrees found'''
+    for key, subtree, context in level:
+        for k, v in step([(key, subtree)], name):
+            if not isinstance(k[-1], int):
+                yield k, v, extend(context, k[-1], k if keys else v, view)
+            elif elements and key and not isinstance(key[-1], int):
+                yield k, v, extend(context, key[-1], k if keys else v, view)
+            else:
+                yield k, v, context
+
+
+def branches(tree, expanded, *, view=False, elements=False, keys=False):
+    '''the flattened context of every key matching expanded
+
+    each context extends its parent's instead of being looked up again
+    from the root. with view=True the contexts are ChainMaps that share
+    their parents' maps rather than fresh dicts. with elements=True a
+    list's name maps to the current element instead of the whole list.
+    with keys=True names map to the keys of their subtrees instead'''
+    if not expanded:
+        return
+    level = [((), tree, collections.ChainMap() if view else {})]
+    for name in expanded:
+        level = branchstep(level, name, view, elements, keys)
+    for key, _, context in level:
+        if isinstance(key[-1], int) and not view:
+            context = dict(context)
+        yield context
+
+
+segment_re = re.compile(r'(\*\*|\*|[^.\[\]*]+)?((?:\[(?:\*|\.\.\.|\d+)\])*)$')
+dot_re = re.compile(r'\.(?![^\[]*\])')
+index_re = re.compile(r'\[(\*|\.\.\.|\d+)\]')
+
+ANY = object()
+DEEP = object()
+
+
+def parsequery(expression):
+    '''the steps of a path expression such as federate.**.parameters[*].name
+
+    * matches any one name and ** any number of levels. [*] or [...]
+    fans out over list elements, which is also done implicitly where the
+    schema has a list, and [n] picks one element'''
+    steps = []
+    for segment in dot_re.split(expression) if expression else ():
+        match = segment_re.match(segment)
+        if not segment or match is None:
+            raise ValueError(f'bad path expression {expression}: {segment!r}')
+        name, indices = match.groups()
+        if name is not None:
+            steps.append({'*': ANY, '**': DEEP}.get(name, name))
+        for index in index_re.findall(indices):
+            steps.append(int(index) if index.isdigit() else Ellipsis)
+    return tuple(steps)
+
+
+def plan(schema, steps):
+    '''the expanded paths in schema matched by steps, depth first'''
+    matched = {}
+    seen = builtins.set()
+    stack = [(schema, (), 0)]
+    while stack:
+        subschema, path, n = stack.pop()
+        if (path, n) in seen:
+            continue
+        seen.add((path, n))
+        if n == len(steps):
+            if path:
+                matched[path] = None
+            continue
+        name = steps[n]
+        following = []
+        if name is DEEP:
+            following.append((subschema, path, n + 1))
+            following.extend((v, p, n) for p, v in schemachildren(path, subschema))
+        elif isinstance(subschema, list):
+            if isinstance(name, int) or name is Ellipsis:
+                following.append((subschema[0], path + (name,), n + 1))
+            else:
+                following.append((subschema[0], path + (Ellipsis,), n))
+        elif isinstance(subschema, dict):
+            if name is ANY:
+                following.extend((v, path + (k,), n + 1)
+                                 for k, v in subschema.items())
+            elif name in subschema:
+                following.append((subschema[name], path + (name,), n + 1))
+        stack.extend(reversed(following))
+    return tuple(matched)
+
+
+class Query:
+    '''a path expression compiled against a schema
+
+    the schema is only searched once, giving the expanded paths the
+    expression matches, and the query is then run by following each of
+    them directly'''
+
+    def __init__(self, schema, expression):
+        self.schema = schema
+        self.expression = expression
+        self.paths = plan(schema, parsequery(expression))
+
+    def __repr__(self):
+        return 'Query({!r})'.format(self.expression)
+
+    def items(self, tree):
+        for expanded in self.paths:
+            yield from pathitems(tree, expanded)
+
+    def keys(self, tree):
+        for key, _ in self.items(tree):
+            yield key
+
+    def values(self, tree):
+        for _, value in self.items(tree):
+            yield value
+
+    __call__ = values
+
+
+class Index:
+    '''a set of key tuples that also answers prefix queries
+
+    keys are kept in a trie of parent prefix to children, so membership
+    is a hash lookup and iteration is depth first in insertion order'''
+
+    def __init__(self, keys=()):
+        self._keys = builtins.set()
+        self._children = {}
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return self.prefixed(())
+
+    def add(self, key):
+        if key not in self._keys:
+            self._keys.add(key)
+            self._children.setdefault(key[:-1], []).append(key)
+
+    def children(self, prefix):
+        return iter(self._children.get(prefix, ()))
+
+    def prefixed(self, prefix):
+        '''every key below prefix, depth first'''
+        stack = [self.children(prefix)]
+        while stack:
+            for key in stack[-1]:
+                yield key
+                stack.append(self.children(key))
+                break
+            else:
+                stack.pop()
 
-    for key in pathkeys(tree, expanded):
-        yield flatten(tree, key)
+
+def haskey(tree, key):
+    '''whether key leads to a subtree of tree
+
+    the tree is itself a trie of its keys, so this costs one lookup for
+    each name in key'''
+    if not key:
+        return False
+    subtree = tree
+    for name in key:
+        if isinstance(subtree, dict):
+            if name not in subtree:
+                return False
+        elif isinstance(subtree, list):
+            if not (isinstance(name, int) and 0 <= name < len(subtree)):
+                return False
+        else:
+            return False
+        subtree = subtree[name]
+    return True
+
+
+def schemapaths(key, value):
+    '''the schema paths that key, holding value, gives its tree
+
+    a list also gives the path of its elements, even when it is empty'''
+    path = keypath(key)
+    if isinstance(value, list):
+        element = keypath(key + (0,))
+        result = (path, element) if element != path else (path,)
+    else:
+        result = (path,)
+    for path in result:
+        # the elements of a list at the root share the root schema
+        if path[:1] == (Ellipsis,):
+            path = path[1:]
+        if path:
+            yield path
+
+
+def subtreeitems(key, value):
+    '''(key, value) and every (key, subtree) pair below it'''
+    yield key, value
+    for k, v in items(value):
+        yield key + k, v
+
+
+def countpaths(counts, pairs, n):
+    '''add n to the number of keys on each schema path of pairs, and drop
+    the paths no key is on any more'''
+    for key, value in pairs:
+        for path in schemapaths(key, value):
+            count = counts.get(path, 0) + n
+            if count:
+                counts[path] = count
+            else:
+                del counts[path]
+
+
+def pathschema(paths):
+    '''the schema holding exactly paths, as schema() gives for a tree'''
+    root = {}
+    for path in paths:
+        s = root
+        for n, name in enumerate(path):
+            if name is Ellipsis:
+                continue
+            node = s.get(name)
+            if n + 1 < len(path) and path[n + 1] is Ellipsis:
+                if not isinstance(node, list):
+                    node = s[name] = [{} if node is None else node]
+            elif node is None:
+                node = s[name] = {}
+            s = node[0] if isinstance(node, list) else node
+    return root
+
+
+class State:
+    '''everything a TreeDict knows about its tree at one moment
+
+    a state is never changed once built. an update builds a new state
+    sharing everything it did not change, and the TreeDict swaps the one
+    reference, so readers always see a whole state
+
+    counts holds the number of keys on each schema path, so an update can
+    tell when the last key on a path has gone. it is None until the first
+    update of a tree whose schema was sampled'''
+
+    __slots__ = ('tree', 'schema', 'paths', 'counts')
+
+    def __init__(self, tree, schema, counts=None):
+        self.tree = tree
+        self.schema = schema
+        self.paths = Index(paths(schema))
+        self.counts = counts
 
 
 class TreeDict:
 
-    def __init__(self, d):
-        self._tree = d
-        self._schema = schema(self._tree)
-        self._paths = list(paths(self._schema))
-        self._keys = list(keys(self._tree))
+    def __init__(self, d, *, sample=None):
+        _schema = {}
+        if sample is None:
+            # schema and path counts from the same traversal
+            counts = {}
+            countpaths(counts, schemaitems(d, _schema), 1)
+        else:
+            schema(d, _schema, sample=sample)
+            counts = None
+        self._state = State(d, _schema, counts)
+        self._proxies = {}
+        self._accessors = {}
+        self._queries = {}
 
     def __str__(self):
-        return str(self._tree)
+        return str(self._state.tree)
 
     def __repr__(self):
-        return 'TreeDict({!r})'.format(self._tree)
+        return 'TreeDict({!r})'.format(self._state.tree)
 
     def ispath(self, path):
-        return path in self._paths
+        return path in self._state.paths
 
     def iskey(self, key):
-        return key in self._keys
+        return haskey(self._state.tree, key)
 
     def canonicalise(self, path):
-        return expandpath(self._schema, path)
+        return expandpath(self._state.schema, path)
 
     def get(self, key):
-        return get(self._tree, key)
+        return get(self._state.tree, key)
 
-    def keys(self):
-        for key in self._keys:
-            yield key
+    def keys(self, prefix=()):
+        tree = self._state.tree
+        if prefix and not haskey(tree, prefix):
+            return
+        for key, _ in items(get(tree, prefix)):
+            yield prefix + key
 
     def values(self):
-        for key in self._keys:
-            yield get(self._tree, key)
+        yield from values(self._state.tree)
 
     def items(self):
-        for key in self._keys:
-            yield key, get(self._tree, key)
-
-    def paths(self):
-        for path in self._paths:
-            yield path
+        yield from items(self._state.tree)
+
+    def paths(self, prefix=()):
+        yield from self._state.paths.prefixed(prefix)
+
+    def children(self, key):
+        tree = self._state.tree
+        if key and not haskey(tree, key):
+            return iter(())
+        return (k for k, _ in children(key, get(tree, key)))
+
+    def walk(self, expanded):
+        return walk(self._state.tree, expanded)
+
+    def branches(self, expanded, **kwargs):
+        return branches(self._state.tree, expanded, **kwargs)
+
+    def node(self, key):
+        '''the Node for the dict or list at key, or the value of a leaf'''
+        value = get(self._state.tree, key)
+        if isinstance(value, (dict, list)):
+            return self.proxy(Node, key)
+        return value
+
+    def proxy(self, cls, path):
+        '''the cls proxy for path, shared by everything navigating to it'''
+        try:
+            return self._proxies[cls, path]
+        except KeyError:
+            proxy = self._proxies[cls, path] = cls.__getter__(self, path)
+            return proxy
+
+    def accessor(self, dotted):
+        '''compile a dotted path into a function returning its values
+
+        list positions are filled in from the schema, as by canonicalise'''
+        try:
+            return self._accessors[dotted]
+        except KeyError:
+            expanded = self.canonicalise(dotted.split('.'))
+            accessor = self._accessors[dotted] = functools.partial(
+                self.walk, expanded)
+            return accessor
+
+    def query(self, expression):
+        '''the Query for expression, compiled once per schema'''
+        schema = self._state.schema
+        query = self._queries.get(expression)
+        if query is None or query.schema is not schema:
+            query = self._queries[expression] = Query(schema, expression)
+        return query
+
+    def set(self, key, value):
+        '''set the subtree at key, updating the schema and indexes
+
+        only the containers along key are copied, and only the old and new
+        subtrees at key are traversed. paths that no key is on any more are
+        dropped from the schema. a snapshot taken before is not affected'''
+        key = tuple(key)
+        state = self._state
+        counts = state.counts
+        if counts is None:
+            counts = {}
+            countpaths(counts, items(state.tree), 1)
+        else:
+            counts = dict(counts)
+
+        # containers created on the way to key
+        countpaths(counts, ((key[:n], {}) for n in range(1, len(key))
+                            if not haskey(state.tree, key[:n])), 1)
+        tree, parent = copypath(state.tree, key[:-1])
+        name = key[-1]
+        if haskey(state.tree, key):
+            countpaths(counts, subtreeitems(key, parent[name]), -1)
+        if isinstance(parent, list) and name == len(parent):
+            parent.append(value)
+        else:
+            parent[name] = value
+        countpaths(counts, subtreeitems(key, value), 1)
+
+        self._state = State(tree, pathschema(counts), counts)
+        # child proxies and accessors may name paths that have gone
+        for proxy in self._proxies.values():
+            proxy.__forget__()
+        self._accessors = {}
+
+    def append(self, key, value):
+        '''append value to the list at key, as by set'''
+        key = tuple(key)
+        self.set(key + (len(self.get(key)),), value)
+
+    def snapshot(self):
+        '''a TreeDict that keeps the current state through later updates'''
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new._proxies = {}
+        new._accessors = {}
+        new._queries = {}
+        return new
 
     def schema(self):
-        return self._schema
+        return self._state.schema
+
+
+LEAF, DICT, LIST = range(3)
+
+
+def column(values, types):
+    '''a typed array for a column of only ints or only floats, else the list
+
+    containers on the path hold None, which the array stores as zero. a
+    path with no leaves has no column'''
+    if not types:
+        return None
+    for cls, typecode in ((int, 'q'), (float, 'd')):
+        if types == {cls}:
+            try:
+                return array.array(typecode, (0 if v is None else v for v in values))
+            except OverflowError:
+                break
+    return values
+
+
+class ColumnarTreeDict(TreeDict):
+    '''a read-only TreeDict storing its tree as columns rather than dicts
+
+    nodes are numbered depth first, the root being 0, and each has the
+    offset just past its subtree, a kind and the id of its schema path.
+    every path has a row of the offsets of its nodes and a column of their
+    leaf values, a typed array where they are all ints or all floats, and
+    equal strings share one object. names are read from the paths, and list
+    positions counted. no reference to the nested dicts is kept, so they
+    can be freed once indexed. walk on a schema path reads its column
+    directly; subtrees are rebuilt only when asked for'''
+
+    def __init__(self, d, *, sample=None):
+        self._state = State(None, schema(d, sample=sample))
+        self._proxies = {}
+        self._accessors = {}
+        self._queries = {}
+
+        self._ends = array.array('i')
+        self._kinds = array.array('b')
+        self._pathids = array.array('i')
+        self._paths = []
+        self._rows = {}
+        ids = {}
+        values = {}
+        types = collections.defaultdict(builtins.set)
+        strings = {}
+
+        def add(path, value):
+            offset = len(self._kinds)
+            kind = DICT if isinstance(value, dict) else LIST if isinstance(value, list) else LEAF
+            pathid = ids.get(path)
+            if pathid is None:
+                pathid = ids[path] = len(self._paths)
+                self._paths.append(path)
+                self._rows[path] = array.array('i')
+                values[path] = []
+            self._ends.append(offset + 1)
+            self._kinds.append(kind)
+            self._pathids.append(pathid)
+            self._rows[path].append(offset)
+            if kind == LEAF:
+                if isinstance(value, str):
+                    value = strings.setdefault(value, value)
+                values[path].append(value)
+                types[path].add(type(value))
+            else:
+                values[path].append(None)
+            return offset
+
+        stack = [(add((), d), (), children((), d))]
+        while stack:
+            parent, path, subtrees = stack[-1]
+            for (name,), value in subtrees:
+                p = path + (Ellipsis if isinstance(name, int) else name,)
+                stack.append((add(p, value), p, children((), value)))
+                break
+            else:
+                stack.pop()
+                self._ends[parent] = len(self._kinds)
+
+        self._columns = {p: column(v, types[p]) for p, v in values.items()}
+
+    def __str__(self):
+        return str(self.get(()))
+
+    def __repr__(self):
+        return 'ColumnarTreeDict({!r})'.format(self.get(()))
+
+    def _children(self, offset):
+        child, end = offset + 1, self._ends[offset]
+        while child < end:
+            yield child
+            child = self._ends[child]
+
+    def _named(self, offset, key):
+        '''the (key, offset) pairs directly below the node at offset'''
+        if self._kinds[offset] == DICT:
+            return ((key + (self._paths[self._pathids[c]][-1],), c)
+                    for c in self._children(offset))
+        return ((key + (n,), c) for n, c in enumerate(self._children(offset)))
+
+    def _descendants(self, offset, key):
+        '''every (key, offset) pair below the node at offset, depth first'''
+        stack = [self._named(offset, key)]
+        while stack:
+            for k, c in stack[-1]:
+                yield k, c
+                stack.append(self._named(c, k))
+                break
+            else:
+                stack.pop()
+
+    def _child(self, offset, name):
+        kind = self._kinds[offset]
+        if kind == DICT:
+            for c in self._children(offset):
+                if self._paths[self._pathids[c]][-1] == name:
+                    return c
+        elif kind == LIST and isinstance(name, int) and name >= 0:
+            return next(itertools.islice(self._children(offset), name, None), None)
+        return None
+
+    def _find(self, key):
+        offset = 0
+        for name in key:
+            offset = self._child(offset, name)
+            if offset is None:
+                return None
+        return offset
+
+    def _step(self, level, name):
+        for offset in level:
+            if name is not Ellipsis:
+                child = self._child(offset, name)
+                if child is not None:
+                    yield child
+            elif self._kinds[offset] == LIST:
+                yield from self._children(offset)
+
+    def _leaf(self, offset):
+        path = self._paths[self._pathids[offset]]
+        row = bisect.bisect_left(self._rows[path], offset)
+        return self._columns[path][row]
+
+    def _value(self, offset):
+        '''the leaf at offset, or its subtree rebuilt from the bottom up'''
+        if self._kinds[offset] == LEAF:
+            return self._leaf(offset)
+        built = {}
+        for n in reversed(range(offset, self._ends[offset])):
+            kind = self._kinds[n]
+            if kind == DICT:
+                built[n] = {self._paths[self._pathids[c]][-1]: built.pop(c)
+                            for c in self._children(n)}
+            elif kind == LIST:
+                built[n] = [built.pop(c) for c in self._children(n)]
+            else:
+                built[n] = self._leaf(n)
+        return built[offset]
+
+    def iskey(self, key):
+        return bool(key) and self._find(key) is not None
+
+    def get(self, key):
+        offset = self._find(key)
+        if offset is None:
+            raise KeyError(key)
+        return self._value(offset)
+
+    def keys(self, prefix=()):
+        offset = self._find(prefix)
+        if offset is None:
+            return
+        for key, _ in self._descendants(offset, prefix):
+            yield key
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def items(self):
+        for key, offset in self._descendants(0, ()):
+            yield key, self._value(offset)
+
+    def children(self, key):
+        offset = self._find(key)
+        if offset is None:
+            return iter(())
+        return (k for k, _ in self._named(offset, key))
+
+    def walk(self, expanded):
+        expanded = tuple(expanded)
+        rows = self._rows.get(expanded) if expanded else None
+        if rows is None:
+            level = iter([0]) if expanded else iter(())
+            for name in expanded:
+                level = self._step(level, name)
+            return (self._value(offset) for offset in level)
+        values = self._columns[expanded]
+        kinds = self._kinds
+        return (values[n] if kinds[offset] == LEAF else self._value(offset)
+                for n, offset in enumerate(rows))
+
+    def branches(self, expanded, **kwargs):
+        # contexts hold subtrees, so these are rebuilt
+        return branches(self.get(()), expanded, **kwargs)
+
+    def node(self, key):
+        offset = self._find(key)
+        if offset is None:
+            raise KeyError(key)
+        if self._kinds[offset] != LEAF:
+            return self.proxy(Node, key)
+        return self._value(offset)
+
+    def set(self, key, value):
+        raise TypeError('ColumnarTreeDict is read-only')
 
 
 class Tree:
 
-    def __init__(self, json_dict):
-        self.__tree__ = TreeDict(json_dict)
+    def __init__(self, json_dict, *, columnar=False):
+        if columnar:
+            self.__tree__ = ColumnarTreeDict(json_dict)
+        else:
+            self.__tree__ = TreeDict(json_dict)
         self.__path__ = tuple()
+        # so that updates reach the root's cached children too
+        self.__tree__._proxies[type(self), self.__path__] = self
 
     def __str__(self):
         return 'Tree({})'.format(self.__tree__)
@@ -219,12 +893,21 @@ class Tree:
     def __repr__(self):
         if self.__path__:
             return 'Tree({}).{}'.format(
-                self.__tree__, '.'.join(self.__path__))
+                self.__tree__,
+                '.'.join(p for p in self.__path__ if p is not Ellipsis))
         else:
             return 'Tree({})'.format(self.__tree__)
 
     def __iter__(self):
-        yield from self.__tree__.get(self.__path__)
+        if Ellipsis not in self.__path__:
+            yield from self.__tree__.get(self.__path__)
+            return
+        # one value per list element along the path
+        for value in self.__tree__.walk(self.__path__):
+            if isinstance(value, list):
+                yield from value
+            else:
+                yield value
 
     @classmethod
     def __getter__(cls, tree, path):
@@ -233,10 +916,63 @@ class Tree:
         new.__path__ = path
         return new
 
+    def __forget__(self):
+        '''drop the cached child proxies, which may name paths that have gone'''
+        tree, path = self.__tree__, self.__path__
+        self.__dict__.clear()
+        self.__tree__, self.__path__ = tree, path
+
     def __getattr__(self, name):
         path = self.__path__ + (name,)
+        if not self.__tree__.ispath(path):
+            # step through the elements of a list
+            path = self.__path__ + (Ellipsis, name)
         if self.__tree__.ispath(path):
-            return self.__getter__(self.__tree__, path)
+            # cache on the instance so __getattr__ is not called again
+            proxy = self.__dict__[name] = self.__tree__.proxy(type(self), path)
+            return proxy
         else:
             raise AttributeError(
-                'Tree: {} has no element {}'.format('.'.join(path[:-1]), name))
+                'Tree: {} has no element {}'.format(
+                    '.'.join(p for p in self.__path__ if p is not Ellipsis),
+                    name))
+
+
+class Node(Tree):
+    '''a proxy for the subtree at one key, for str.format
+
+    the items of a dict are read as attributes and the elements of a list
+    by iterating or indexing. leaves are returned as they are. like Tree
+    proxies, nodes are shared through TreeDict.proxy and cache what they
+    return until the TreeDict is updated'''
+
+    def __str__(self):
+        return str(self.__tree__.get(self.__path__))
+
+    def __repr__(self):
+        return 'Node({}, {!r})'.format(self.__tree__, self.__path__)
+
+    def __iter__(self):
+        tree = self.__tree__
+        return (tree.node(key) for key in tree.children(self.__path__))
+
+    def __len__(self):
+        return len(self.__tree__.get(self.__path__))
+
+    def __getitem__(self, name):
+        if isinstance(name, slice):
+            return [self[n] for n in range(*name.indices(len(self)))]
+        key = self.__path__ + (name,)
+        if not self.__tree__.iskey(key):
+            raise KeyError(name)
+        return self.__tree__.node(key)
+
+    def __getattr__(self, name):
+        key = self.__path__ + (name,)
+        if name.startswith('_') or not self.__tree__.iskey(key):
+            raise AttributeError(
+                'Node: {} has no element {}'.format(
+                    '.'.join(map(str, self.__path__)), name))
+        # cache on the instance so __getattr__ is not called again
+        value = self.__dict__[name] = self.__tree__.node(key)
+        return value